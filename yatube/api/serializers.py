@@ -0,0 +1,56 @@
+from django.core.files.storage import default_storage
+
+# Имя поля в ответе -> поле для values(). Экземпляры моделей не создаются.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'image': _image_url,
+}
+
+
+def select_fields(request, available, prefix=''):
+    """Поля из параметра fields (через запятую) или все доступные.
+
+    Возвращает словарь имя в ответе -> поле для values() с префиксом
+    prefix, например 'post__' для записей ленты подписок.
+    """
+    raw = request.GET.get('fields')
+    names = [name for name in raw.split(',') if name] if raw else available
+    unknown = set(names) - set(available)
+    if unknown:
+        raise ValueError('Неизвестные поля: ' + ', '.join(sorted(unknown)))
+    return {name: prefix + available[name] for name in names}
+
+
+def serialize(rows, columns):
+    converters = [
+        (name, lookup, CONVERTERS.get(name))
+        for name, lookup in columns.items()
+    ]
+    return [
+        {
+            name: convert(row[lookup]) if convert else row[lookup]
+            for name, lookup, convert in converters
+        }
+        for row in rows
+    ]
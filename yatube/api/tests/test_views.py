@@ -0,0 +1,206 @@
+import json
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+POSTS_ON_PAGE = 10
+QUEUE_DIR = tempfile.mkdtemp()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(POSTS_ON_PAGE + 3)
+        )
+        cls.post = Post.objects.order_by('-pub_date', '-id').first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+            for i in range(3)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get(self, url, client=None, status=200):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, status, response.content)
+        return json.loads(response.content)
+
+    def walk(self, url, client=None):
+        seen = []
+        while url:
+            data = self.get(url, client)
+            seen.extend(data['results'])
+            url = data['next']
+        return seen
+
+    def test_feeds_walk_all_posts(self):
+        for url in (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile_posts', args=[self.author.username]),
+        ):
+            with self.subTest(url=url):
+                posts = self.walk(url)
+                self.assertEqual(len(posts), POSTS_ON_PAGE + 3)
+                self.assertEqual(posts[0]['id'], self.post.id)
+                self.assertEqual(posts[0]['author'], 'author')
+                self.assertEqual(posts[0]['group'], 'group')
+
+    def test_follow_feed(self):
+        self.get(reverse('api:follow_posts'), status=401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = self.walk(reverse('api:follow_posts'), self.reader_client)
+        self.assertEqual(len(posts), POSTS_ON_PAGE + 3)
+        self.assertEqual(posts[0]['text'], self.post.text)
+
+    def test_null_cursor_opens_first_page(self):
+        for url in (
+            reverse('api:post_list'),
+            reverse('api:comments', args=[self.post.id]),
+        ):
+            first = self.get(url)['results']
+            for param in ('after', 'before'):
+                with self.subTest(url=url, param=param):
+                    data = self.get(f'{url}?{param}=W251bGwsbnVsbF0')
+                    self.assertEqual(data['results'], first)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_follow_feed_merges_popular_authors(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        Post.objects.create(author=other, text='Свой пост')
+        cache.clear()
+        url = reverse('api:follow_posts') + '?fields=id,text,author'
+        with CaptureQueriesContext(connection) as queries:
+            posts = self.walk(url, self.reader_client)
+        self.assertEqual(len(posts), POSTS_ON_PAGE + 4)
+        self.assertEqual(posts[0]['text'], 'Свой пост')
+        self.assertEqual(len({post['id'] for post in posts}), len(posts))
+        self.assertFalse(
+            [q for q in queries if 'IN (SELECT' in q['sql'].upper()]
+        )
+
+    def test_sparse_fields(self):
+        data = self.get(reverse('api:post_list') + '?fields=id,author')
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        data = self.get(
+            reverse('api:post_list') + '?fields=id,password', status=400
+        )
+        self.assertIn('password', data['error'])
+
+    def test_compact_output(self):
+        response = self.client.get(reverse('api:post_detail', args=[
+            self.post.id
+        ]))
+        content = response.content.decode()
+        self.assertNotIn(': ', content)
+        self.assertIn(self.post.text, content)
+
+    def test_list_does_not_instantiate_models(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(reverse('api:post_list'))
+        sql = queries[-1]['sql']
+        self.assertNotIn('"thumbnails"', sql)
+        self.assertIn('"auth_user"."username"', sql)
+
+    def test_post_detail(self):
+        data = self.get(reverse('api:post_detail', args=[self.post.id]))
+        self.assertEqual(data['comments_count'], self.post.comments_count)
+        self.assertIsNone(data['image'])
+        self.get(reverse('api:post_detail', args=[1000]), status=404)
+
+    def test_comments(self):
+        url = reverse('api:comments', args=[self.post.id])
+        self.assertEqual(len(self.get(url)['results']), 3)
+        self.assertEqual(
+            self.client.post(url, {'text': 'Аноним'}).status_code, 401
+        )
+        response = self.reader_client.post(
+            url, json.dumps({'text': 'Новый'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)['author'], 'reader')
+        self.assertEqual(self.get(url)['results'][0]['text'], 'Новый')
+        response = self.reader_client.post(url, {'text': ''})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(
+        COMMENTS_WRITE_BEHIND=True,
+        COMMENTS_FLUSH_ASYNC=False,
+        COMMENT_QUEUE_DIR=QUEUE_DIR,
+    )
+    def test_comment_queued(self):
+        response = self.reader_client.post(
+            reverse('api:comments', args=[self.post.id]), {'text': 'Позже'}
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Comment.objects.filter(text='Позже').exists())
+
+    def test_follow_and_unfollow(self):
+        url = reverse('api:follow', args=[self.author.username])
+        self.assertEqual(self.reader_client.post(url).status_code, 201)
+        self.assertEqual(self.reader_client.post(url).status_code, 200)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertEqual(self.reader_client.delete(url).status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            self.reader_client.post(
+                reverse('api:follow', args=['reader'])
+            ).status_code,
+            400,
+        )
+
+    def test_writes_check_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        comments = reverse('api:comments', args=[self.post.id])
+        follow = reverse('api:follow', args=[self.author.username])
+        for response in (
+            client.post(comments, {'text': 'Без токена'}),
+            client.post(follow),
+        ):
+            self.assertEqual(response.status_code, 403)
+            self.assertIn('X-CSRFToken', json.loads(response.content)['error'])
+        client.get(reverse('users:login'))
+        token = client.cookies['csrftoken'].value
+        response = client.post(
+            comments, {'text': 'С токеном'}, HTTP_X_CSRFTOKEN=token
+        )
+        self.assertEqual(response.status_code, 201)
+        response = client.post(follow, HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+
+    def test_conditional_get(self):
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,255 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_http_methods
+
+from posts import comment_queue
+from posts.cache import GLOBAL, cached_view
+from posts.feed import FEED_KEYS, popular_author_ids
+from posts.forms import CommentForm
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.utils import (AMOUNT_COMMENTS, AMOUNT_POSTS, COMMENT_KEYS,
+                         POST_KEYS, KeysetPaginator, MergedKeysetPaginator,
+                         link_pages)
+from posts.views import post_scopes
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, select_fields,
+                          serialize)
+
+MAX_LIMIT: int = 100
+
+
+def respond(data, status=200):
+    # Без пробелов и с кириллицей как есть: ответ короче и лучше сжимается.
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def error(status, message, **extra):
+    return respond({'error': message, **extra}, status=status)
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(401, 'Нужна авторизация.')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def api_csrf_protect(view):
+    """Проверка CSRF с ответом в JSON вместо HTML-страницы ошибки."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        rejected = CsrfViewMiddleware().process_view(request, None, (), {})
+        if rejected is not None:
+            return error(
+                403,
+                'Нужен CSRF-токен из cookie csrftoken '
+                'в заголовке X-CSRFToken.',
+            )
+        return view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def limit(request, default):
+    try:
+        value = int(request.GET.get('limit', default))
+    except ValueError:
+        return default
+    return max(1, min(value, MAX_LIMIT))
+
+
+def page(request, queryset, available, keys, prefix='', per_page=None,
+         merge=()):
+    """Страница по курсору: results, next и previous со ссылками.
+
+    Строки выбираются через values() только с запрошенными полями.
+    merge - выборки постов, которые сливаются со страницей по POST_KEYS,
+    каждая по своему индексу: так в ленту подписок попадают посты
+    популярных авторов.
+    """
+    try:
+        columns = select_fields(request, available, prefix)
+    except ValueError as exc:
+        return error(400, str(exc))
+    rows = queryset.values(*{*columns.values(), *keys})
+    per_page = limit(request, per_page or AMOUNT_POSTS)
+    if merge:
+        plain = select_fields(request, available)
+
+        def prefixed(row):
+            return {prefix + name: value for name, value in row.items()}
+
+        paginator = MergedKeysetPaginator([(rows, keys)] + [
+            (posts.values(*{*plain.values(), *POST_KEYS}), POST_KEYS,
+             prefixed)
+            for posts in merge
+        ], per_page)
+    else:
+        paginator = KeysetPaginator(rows, per_page, keys)
+    page_obj = link_pages(request, paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    ))
+    return respond({
+        'results': serialize(page_obj, columns),
+        'next': (
+            f'{request.path}?{page_obj.next_query}'
+            if page_obj.has_next() else None
+        ),
+        'previous': (
+            f'{request.path}?{page_obj.previous_query}'
+            if page_obj.has_previous() else None
+        ),
+    })
+
+
+def payload(request):
+    if request.content_type != 'application/json':
+        return request.POST
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@gzip_page
+@require_GET
+@cached_view(lambda request: [GLOBAL])
+def post_list(request):
+    return page(request, Post.objects.all(), POST_FIELDS, POST_KEYS)
+
+
+@gzip_page
+@require_GET
+@cached_view(lambda request, slug: [('group', slug)])
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        return error(404, 'Группа не найдена.')
+    return page(
+        request, Post.objects.filter(group_id=group_id), POST_FIELDS,
+        POST_KEYS,
+    )
+
+
+@gzip_page
+@require_GET
+@cached_view(lambda request, username: [('author', username)])
+def profile_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return error(404, 'Пользователь не найден.')
+    return page(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS,
+        POST_KEYS,
+    )
+
+
+@gzip_page
+@require_GET
+@api_login_required
+@cached_view(lambda request: [GLOBAL, ('follow', request.user.pk)])
+def follow_posts(request):
+    return page(
+        request, FeedEntry.objects.filter(user=request.user), POST_FIELDS,
+        FEED_KEYS, prefix='post__', merge=[
+            Post.objects.filter(author_id=author_id)
+            for author_id in popular_author_ids(request.user)
+        ],
+    )
+
+
+@gzip_page
+@require_GET
+@cached_view(post_scopes)
+def post_detail(request, post_id):
+    try:
+        columns = select_fields(request, POST_FIELDS)
+    except ValueError as exc:
+        return error(400, str(exc))
+    rows = Post.objects.filter(pk=post_id).values(*columns.values())
+    if not rows:
+        return error(404, 'Пост не найден.')
+    return respond(serialize(rows, columns)[0])
+
+
+@cached_view(lambda request, post_id: [('post', post_id)])
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Пост не найден.')
+    return page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        COMMENT_KEYS, per_page=AMOUNT_COMMENTS,
+    )
+
+
+@api_login_required
+def add_comment(request, post_id):
+    form = CommentForm(payload(request))
+    if not form.is_valid():
+        return error(400, 'Неверные данные.', errors=form.errors)
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Пост не найден.')
+    text = form.cleaned_data['text']
+    if settings.COMMENTS_WRITE_BEHIND:
+        comment_queue.enqueue(post_id, request.user, text)
+        return respond({'post': post_id, 'text': text}, status=202)
+    comment = Comment.objects.create(
+        post_id=post_id, author=request.user, text=text
+    )
+    return respond({
+        'id': comment.id,
+        'post': post_id,
+        'author': request.user.username,
+        'text': text,
+        'created': comment.created,
+    }, status=201)
+
+
+@gzip_page
+@api_csrf_protect
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def comments(request, post_id):
+    if request.method == 'POST':
+        return add_comment(request, post_id)
+    return comment_list(request, post_id)
+
+
+@api_csrf_protect
+@require_http_methods(['POST', 'DELETE'])
+@api_login_required
+def follow(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return error(404, 'Пользователь не найден.')
+    if request.method == 'DELETE':
+        Follow.objects.filter(user=request.user, author_id=author_id).delete()
+        return HttpResponse(status=204)
+    if author_id == request.user.pk:
+        return error(400, 'Нельзя подписаться на себя.')
+    _, created = Follow.objects.get_or_create(
+        user=request.user, author_id=author_id
+    )
+    return respond(
+        {'author': username, 'following': True},
+        status=201 if created else 200,
+    )
@@ -0,0 +1,33 @@
+import threading
+
+from django.conf import settings
+
+REPLICA: str = 'replica'
+
+_state = threading.local()
+
+
+def read_from_replica(enabled):
+    _state.replica = enabled
+
+
+def reading_from_replica():
+    return getattr(_state, 'replica', False) and REPLICA in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """Отправляет чтение страниц лент на реплику, всё остальное на primary."""
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
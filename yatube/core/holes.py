@@ -0,0 +1,24 @@
+import re
+
+from django.core import signing
+from django.template.loader import render_to_string
+
+SALT: str = 'core.holes'
+PLACEHOLDER = re.compile(r'<!--hole:([\w.:-]+)-->')
+
+
+def punch(template_name, params):
+    value = signing.dumps([template_name, params], salt=SALT, compress=True)
+    return f'<!--hole:{value}-->'
+
+
+def fill_holes(request, content):
+    """Подставляет в общую закешированную страницу фрагменты пользователя."""
+    def render_hole(match):
+        try:
+            template_name, params = signing.loads(match.group(1), salt=SALT)
+        except signing.BadSignature:
+            return ''
+        return render_to_string(template_name, params, request=request)
+
+    return PLACEHOLDER.sub(render_hole, content)
@@ -0,0 +1,130 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import override_settings
+
+from posts.models import Comment, Post, User
+from posts.utils import AMOUNT_POSTS
+
+# Настройки SQLite по умолчанию: журнал отката, полная синхронизация
+# и отложенные транзакции.
+BASELINE = {
+    'SQLITE_PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'SQLITE_TRANSACTION_MODE': None,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает копию базы SQLite смесью чтения и записи из нескольких '
+        'потоков и сравнивает пропускную способность с настройками SQLite '
+        'по умолчанию и с SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--writes', type=float, default=0.2,
+            help='Доля записывающих операций, от 0 до 1.',
+        )
+
+    def read(self, post_ids):
+        list(Post.objects.for_feed()[:AMOUNT_POSTS])
+        post = Post.objects.for_feed().get(pk=random.choice(post_ids))
+        list(post.comments.select_related('author'))
+
+    def write(self, author, post_ids, number):
+        with transaction.atomic():
+            if number % 2:
+                Comment.objects.create(
+                    post_id=random.choice(post_ids),
+                    author=author,
+                    text=f'Комментарий {number}',
+                )
+            else:
+                Post.objects.create(author=author, text=f'Пост {number}')
+
+    def worker(self, author, post_ids, options, deadline, totals, lock):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        number = 0
+        try:
+            while time.monotonic() < deadline:
+                number += 1
+                try:
+                    if random.random() < options['writes']:
+                        self.write(author, post_ids, number)
+                        counts['writes'] += 1
+                    else:
+                        self.read(post_ids)
+                        counts['reads'] += 1
+                except OperationalError:
+                    counts['errors'] += 1
+        finally:
+            connection.close()
+        with lock:
+            for name, value in counts.items():
+                totals[name] += value
+
+    def run(self, path, options):
+        connections['default'].close()
+        connections.databases['default']['NAME'] = path
+        author = User.objects.create_user(username='load_test_author')
+        post_ids = [
+            Post.objects.create(author=author, text=f'Пост {number}').pk
+            for number in range(AMOUNT_POSTS)
+        ]
+        totals = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(author, post_ids, options, deadline, totals, lock),
+            )
+            for _ in range(options['threads'])
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        connections['default'].close()
+        return {name: value / elapsed for name, value in totals.items()}
+
+    def report(self, title, rates):
+        self.stdout.write(
+            f'{title}: чтение {rates["reads"]:.0f}/с, '
+            f'запись {rates["writes"]:.0f}/с, '
+            f'ошибки блокировки {rates["errors"]:.1f}/с'
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections['default'].settings_dict
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Нагрузочный тест рассчитан на SQLite.')
+        source = settings_dict['NAME']
+        connections['default'].ensure_connection()
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for title, overrides in (
+                ('SQLite по умолчанию', BASELINE),
+                ('SQLITE_PRAGMAS', {}),
+            ):
+                path = os.path.join(directory, f'load-{len(results)}.sqlite3')
+                target = sqlite3.connect(path)
+                connections['default'].connection.backup(target)
+                target.close()
+                with override_settings(**overrides):
+                    results[title] = self.run(path, options)
+                connections.databases['default']['NAME'] = source
+                connections['default'].ensure_connection()
+        for title, rates in results.items():
+            self.report(title, rates)
@@ -0,0 +1,125 @@
+import bisect
+import threading
+
+# Границы корзин гистограмм: секунды для времени, штуки для запросов.
+TIME_BUCKETS: tuple = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS: tuple = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время ответа на запрос.', TIME_BUCKETS,
+    ),
+    'yatube_db_queries': ('Число запросов к базе за запрос.', COUNT_BUCKETS),
+    'yatube_db_duration_seconds': (
+        'Время запросов к базе за запрос.', TIME_BUCKETS,
+    ),
+    'yatube_template_duration_seconds': (
+        'Время отрисовки шаблонов за запрос.', TIME_BUCKETS,
+    ),
+}
+COUNTERS = {
+    'yatube_requests_total': 'Число запросов по представлениям и статусам.',
+    'yatube_page_cache_total': (
+        'Обращения к кешу страниц: hit, stale, miss, bypass, not_modified.'
+    ),
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_local = threading.local()
+
+
+class RequestStats:
+    """Всё, что набралось за один запрос в этом потоке."""
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.capture_sql = capture_sql
+        self.sql = []
+
+
+def start_request(capture_sql=False):
+    _local.stats = RequestStats(capture_sql)
+    return _local.stats
+
+
+def finish_request():
+    _local.stats = None
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    buckets = HISTOGRAMS[name][1]
+    with _lock:
+        series = _histograms.setdefault(name, {}).setdefault(
+            _key(labels), {'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+        )
+        position = bisect.bisect_left(buckets, value)
+        if position < len(buckets):
+            series['buckets'][position] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+def render():
+    """Метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    with _lock:
+        for name, help_text in COUNTERS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for key, value in sorted(_counters.get(name, {}).items()):
+                lines.append(f'{name}{_labels(key)} {value}')
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [
+                f'# HELP {name} {help_text}', f'# TYPE {name} histogram'
+            ]
+            for key, series in sorted(_histograms.get(name, {}).items()):
+                total = 0
+                for bound, count in zip(buckets, series['buckets']):
+                    total += count
+                    lines.append(
+                        f'{name}_bucket{_labels(key, le=bound)} {total}'
+                    )
+                lines += [
+                    f'{name}_bucket{_labels(key, le="+Inf")} '
+                    f'{series["count"]}',
+                    f'{name}_sum{_labels(key)} {series["sum"]}',
+                    f'{name}_count{_labels(key)} {series["count"]}',
+                ]
+    return '\n'.join(lines) + '\n'
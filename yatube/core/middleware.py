@@ -0,0 +1,167 @@
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.crypto import constant_time_compare
+
+from . import metrics, profiling
+from .db_routers import read_from_replica
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE: str = 'yatube_primary'
+SAFE_METHODS: tuple = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """Читает страницы из REPLICA_VIEWS с реплики.
+
+    После любого изменяющего запроса браузер получает куку, и следующие
+    REPLICA_PIN_SECONDS секунд пользователь читает с primary, чтобы сразу
+    увидеть свой пост или комментарий.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica(False)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        read_from_replica(
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+        )
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса: время, запросы к базе, шаблоны, кеш.
+
+    У доли запросов SLOW_REQUEST_SAMPLE_RATE запоминается SQL, и если
+    такой запрос оказался медленным, он пишется в лог вместе с SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def record_query(self, execute, sql, params, many, context):
+        stats = metrics.current()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if stats is not None:
+                elapsed = time.perf_counter() - start
+                stats.queries += 1
+                stats.db_time += elapsed
+                if (
+                    stats.capture_sql
+                    and len(stats.sql) < settings.SLOW_REQUEST_MAX_QUERIES
+                ):
+                    stats.sql.append((elapsed, sql, params))
+
+    def __call__(self, request):
+        stats = metrics.start_request(
+            capture_sql=random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+        )
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(self.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.inc(
+            'yatube_requests_total', view=view, status=response.status_code
+        )
+        metrics.observe('yatube_request_duration_seconds', elapsed, view=view)
+        metrics.observe('yatube_db_queries', stats.queries, view=view)
+        metrics.observe('yatube_db_duration_seconds', stats.db_time, view=view)
+        metrics.observe(
+            'yatube_template_duration_seconds', stats.template_time, view=view
+        )
+        page_cache = getattr(request, 'page_cache', None)
+        if page_cache:
+            metrics.inc(
+                'yatube_page_cache_total', view=view, result=page_cache
+            )
+        if stats.capture_sql and elapsed >= settings.SLOW_REQUEST_SECONDS:
+            self.log_slow(request, view, elapsed, stats)
+        return response
+
+    def log_slow(self, request, view, elapsed, stats):
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.3f с, запросов к базе %d '
+            'за %.3f с, шаблоны %.3f с\n%s',
+            request.method,
+            request.get_full_path(),
+            view,
+            elapsed,
+            stats.queries,
+            stats.db_time,
+            stats.template_time,
+            '\n'.join(
+                f'{duration * 1000:8.2f} мс  {sql} {params}'
+                for duration, sql, params in stats.sql
+            ),
+        )
+
+
+class ProfilerMiddleware:
+    """Снимает профиль запроса, если его просит заголовок X-Profile.
+
+    Значение заголовка должно совпадать с PROFILER_TOKEN; с
+    PROFILER_ENABLED профилируются все запросы. PROFILER_VIEWS ограничивает
+    профилирование этими представлениями. Имя файла с профилем
+    возвращается в заголовке ответа X-Profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def requested(self, request):
+        token = settings.PROFILER_TOKEN
+        if not settings.PROFILER_ENABLED and not (
+            token and constant_time_compare(
+                request.headers.get('X-Profile', ''), token
+            )
+        ):
+            return False
+        if not settings.PROFILER_VIEWS:
+            return True
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.view_name in settings.PROFILER_VIEWS
+
+    def __call__(self, request):
+        if not self.requested(request):
+            return self.get_response(request)
+        with profiling.profiled('unmatched') as session:
+            response = self.get_response(request)
+            if session is not None and request.resolver_match:
+                session.label = request.resolver_match.view_name
+        if session is not None:
+            response['X-Profile'] = os.path.basename(session.path)
+        return response
@@ -0,0 +1,152 @@
+import cProfile
+import collections
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Профили за последнюю минуту: не больше PROFILER_RATE_LIMIT на процесс.
+RATE_PERIOD: int = 60
+
+_lock = threading.Lock()
+_recent = collections.deque()
+_local = threading.local()
+
+
+class CProfiler:
+    """Детерминированный профиль cProfile, читается модулем pstats."""
+
+    suffix = '.pstats'
+
+    def __init__(self, interval):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler(threading.Thread):
+    """Раз в interval секунд снимает стек потока, который профилируется.
+
+    Пишет свёрнутые стеки (collapsed stacks), из которых flamegraph.pl
+    или speedscope строят флеймграф. Почти не замедляет запрос.
+    """
+
+    suffix = '.collapsed'
+
+    def __init__(self, interval):
+        super().__init__(name='profiler', daemon=True)
+        self.interval = interval
+        self.target = None
+        self.stacks = collections.Counter()
+        self.done = threading.Event()
+
+    def start(self):
+        self.target = threading.get_ident()
+        super().start()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(
+                    code.co_name,
+                    os.path.basename(code.co_filename),
+                    code.co_firstlineno,
+                ))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+PROFILERS = {
+    'cprofile': CProfiler,
+    'sampling': SamplingProfiler,
+}
+
+
+class Session:
+    """Текущий профиль: label попадает в имя файла, path - путь к нему."""
+
+    def __init__(self, label):
+        self.label = label
+        self.path = None
+
+
+def allow():
+    now = time.monotonic()
+    with _lock:
+        while _recent and _recent[0] <= now - RATE_PERIOD:
+            _recent.popleft()
+        if len(_recent) >= settings.PROFILER_RATE_LIMIT:
+            return False
+        _recent.append(now)
+        return True
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+
+
+def active():
+    """Профилируется ли сейчас код в этом потоке."""
+    return getattr(_local, 'active', False)
+
+
+def _save(profiler, label):
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    name = '{}-{}-{}{}'.format(
+        time.strftime('%Y%m%d-%H%M%S'),
+        label.replace(':', '-'),
+        uuid.uuid4().hex[:8],
+        profiler.suffix,
+    )
+    path = os.path.join(settings.PROFILER_DIR, name)
+    profiler.save(path)
+    return path
+
+
+@contextmanager
+def profiled(label, enabled=True):
+    """Профилирует блок, если он запрошен и лимит профилей не исчерпан.
+
+    Отдаёт Session или None, если профиль не снимается. Вложенные блоки
+    в том же потоке попадают в профиль внешнего.
+    """
+    if not enabled or active() or not allow():
+        yield None
+        return
+    session = Session(label)
+    profiler = PROFILERS[settings.PROFILER_MODE](
+        settings.PROFILER_SAMPLE_INTERVAL
+    )
+    _local.active = True
+    profiler.start()
+    try:
+        yield session
+    finally:
+        profiler.stop()
+        _local.active = False
+        session.path = _save(profiler, session.label)
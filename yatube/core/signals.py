@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def set_transaction_mode(connection, mode):
+    # В режиме WAL отложенная транзакция, начавшая с чтения, не ждёт
+    # блокировки записи и сразу падает с «database is locked». BEGIN
+    # IMMEDIATE берёт блокировку записи в начале atomic(), и тогда
+    # работает busy_timeout.
+    def start_transaction():
+        connection.cursor().execute(f'BEGIN {mode}')
+
+    connection._start_transaction_under_autocommit = start_transaction
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection, settings.SQLITE_PRAGMAS)
+    if settings.SQLITE_TRANSACTION_MODE:
+        set_transaction_mode(connection, settings.SQLITE_TRANSACTION_MODE)
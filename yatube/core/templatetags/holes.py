@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.holes import punch
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """Фрагмент, который отрисовывается для каждого пользователя отдельно.
+
+    На страницах из общего кеша вместо фрагмента выводится метка, которую
+    cached_view заменяет уже после чтения страницы из кеша.
+    """
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(punch(template_name, params))
+    with context.push(**params):
+        return context.template.engine.get_template(template_name).render(
+            context
+        )
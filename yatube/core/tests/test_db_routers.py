@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve
+
+from core.db_routers import (PrimaryReplicaRouter, read_from_replica,
+                             reading_from_replica)
+from core.middleware import PIN_COOKIE, ReplicaRoutingMiddleware
+from posts.models import Post
+
+WITH_REPLICA = {
+    **settings.DATABASES,
+    'replica': {**settings.DATABASES['default'], 'NAME': 'replica.sqlite3'},
+}
+
+
+@override_settings(DATABASES=WITH_REPLICA)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        read_from_replica(False)
+
+    def route(self, request):
+        request.resolver_match = resolve(request.path)
+        seen = {}
+
+        def view(request):
+            seen['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return seen['db'], response
+
+    def test_router_reads_replica_only_when_enabled(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        read_from_replica(True)
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    @override_settings(DATABASES=settings.DATABASES)
+    def test_router_ignores_missing_replica(self):
+        read_from_replica(True)
+        self.assertFalse(reading_from_replica())
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_feed_views_read_from_replica(self):
+        db, _ = self.route(self.factory.get('/'))
+        self.assertEqual(db, 'replica')
+        self.assertFalse(reading_from_replica())
+
+    def test_other_views_read_from_primary(self):
+        db, _ = self.route(self.factory.get('/create/'))
+        self.assertEqual(db, 'default')
+
+    def test_writes_pin_user_to_primary(self):
+        db, response = self.route(self.factory.post('/posts/1/comment/'))
+        self.assertEqual(db, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        db, _ = self.route(request)
+        self.assertEqual(db, 'default')
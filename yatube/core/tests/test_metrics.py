@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_is_measured(self):
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 1', text
+        )
+        for name in (
+            'yatube_request_duration_seconds',
+            'yatube_db_queries',
+            'yatube_db_duration_seconds',
+            'yatube_template_duration_seconds',
+        ):
+            with self.subTest(name=name):
+                self.assertIn(f'{name}_count{{view="posts:index"}} 1', text)
+                self.assertIn(
+                    f'{name}_bucket{{view="posts:index",le="+Inf"}} 1', text
+                )
+
+    def test_page_cache_results(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        for result in ('miss', 'hit'):
+            with self.subTest(result=result):
+                self.assertIn(
+                    'yatube_page_cache_total'
+                    f'{{result="{result}",view="posts:index"}} 1',
+                    text,
+                )
+
+    @override_settings(SLOW_REQUEST_SECONDS=0, SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_request_logged_with_sql(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_SECONDS=0, SLOW_REQUEST_SAMPLE_RATE=0)
+    def test_unsampled_request_not_logged(self):
+        with self.assertNoLogs('core.middleware', 'WARNING'):
+            self.client.get(reverse('posts:index'))
+
+    def test_metrics_closed_for_other_addresses(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 403)
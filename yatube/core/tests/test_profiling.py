@@ -0,0 +1,87 @@
+import os
+import pstats
+import shutil
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from posts.models import Post, User
+
+PROFILER_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILER_DIR=PROFILER_DIR, PROFILER_TOKEN='secret', PROFILER_RATE_LIMIT=5
+)
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+
+    def profile(self, name='posts:index', token='secret'):
+        response = self.client.get(reverse(name), HTTP_X_PROFILE=token)
+        self.assertEqual(response.status_code, 200)
+        if not response.has_header('X-Profile'):
+            return None
+        return os.path.join(PROFILER_DIR, response['X-Profile'])
+
+    def test_cprofile_stats_saved(self):
+        path = self.profile()
+        self.assertIn('-posts-index-', os.path.basename(path))
+        self.assertTrue(path.endswith('.pstats'))
+        stats = pstats.Stats(path)
+        functions = {name for _, _, name in stats.stats}
+        self.assertIn('index', functions)
+        self.assertIn('render', functions)
+
+    def test_not_profiled_without_token(self):
+        for token in ('', 'wrong'):
+            with self.subTest(token=token):
+                self.assertIsNone(self.profile(token=token))
+
+    @override_settings(PROFILER_ENABLED=True)
+    def test_enabled_profiles_every_request(self):
+        self.assertIsNotNone(self.profile(token=''))
+
+    @override_settings(PROFILER_VIEWS=['posts:profile'])
+    def test_only_listed_views_profiled(self):
+        self.assertIsNone(self.profile())
+
+    @override_settings(PROFILER_RATE_LIMIT=1)
+    def test_rate_limit(self):
+        self.assertIsNotNone(self.profile())
+        self.assertIsNone(self.profile())
+
+    @override_settings(
+        PROFILER_MODE='sampling', PROFILER_SAMPLE_INTERVAL=0.001
+    )
+    def test_sampling_collapsed_stacks(self):
+        def busy():
+            deadline = time.monotonic() + 0.05
+            while time.monotonic() < deadline:
+                pass
+
+        with profiling.profiled('busy') as session:
+            busy()
+        self.assertTrue(session.path.endswith('.collapsed'))
+        with open(session.path, encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn('busy (test_profiling.py:', stack.split(';')[-1])
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+def pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+class SQLitePragmaTests(TestCase):
+    def test_connection_is_tuned(self):
+        self.assertEqual(pragma(connection, 'synchronous'), 1)
+        self.assertEqual(pragma(connection, 'busy_timeout'), 5000)
+        self.assertEqual(pragma(connection, 'cache_size'), -20000)
+
+
+class SQLiteTransactionTests(TransactionTestCase):
+    def test_atomic_takes_write_lock_at_begin(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pragma(connection, 'user_version')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class SQLiteFileTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'test.sqlite3')
+
+    def open(self):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}, alias='file'
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_file_database_uses_wal(self):
+        self.assertEqual(pragma(self.open(), 'journal_mode'), 'wal')
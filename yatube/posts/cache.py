@@ -0,0 +1,267 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from core.db_routers import REPLICA, reading_from_replica
+from core.holes import fill_holes
+from core.middleware import PIN_COOKIE
+
+GLOBAL = ('global',)
+
+# Блокировка пересборки держится на cache.add, а он атомарен не везде:
+# у FileBasedCache два процесса могут взять её одновременно. С другими
+# бэкендами страница просто пересобирается без блокировки.
+SINGLE_FLIGHT_BACKENDS: frozenset = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.memcached.MemcachedCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+})
+
+
+def version_key(scope):
+    raw = ':'.join(str(part) for part in scope)
+    return 'feed-version:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            cache.add(key, version, None)
+            versions[key] = cache.get(key, version)
+    return [versions[key] for key in keys]
+
+
+def scopes_for_post(post):
+    return (
+        GLOBAL,
+        ('post', post.pk),
+        ('author', post.author.username),
+        ('group', post.group.slug if post.group_id else None),
+    )
+
+
+def _bump(scopes):
+    # Версия - время изменения в наносекундах, по ней же считается
+    # Last-Modified. Гонка двух сбросов не страшна: оба дают новую версию.
+    for scope in scopes:
+        key = version_key(scope)
+        current = cache.get(key) or 0
+        cache.set(key, max(_new_version(), current + 1), None)
+
+
+def bump(*scopes):
+    """Сбрасывает кеш страниц, зависящих от переданных областей.
+
+    Версия увеличивается сразу и ещё раз после фиксации транзакции, чтобы
+    страница, собранная по незафиксированным данным, не осталась в кеше.
+    """
+    scopes = [scope for scope in scopes if scope[-1] is not None]
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _variant(request):
+    if getattr(request, 'punch_holes', False):
+        return 'shared'
+    if not request.user.is_authenticated:
+        return 'anon'
+    return '{}:{}'.format(
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
+
+
+def page_key(request, name, scopes):
+    versions = get_versions(scopes)
+    raw = '|'.join(
+        [name, _variant(request), request.get_full_path()]
+        + [str(version) for version in versions]
+    )
+    return 'feed-page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def replica_bucket():
+    """Номер интервала REPLICA_CACHE_TIMEOUT при чтении с реплики.
+
+    Ответ с реплики может отставать от версии, поэтому его ETag меняется
+    не реже раза в этот интервал.
+    """
+    if not reading_from_replica():
+        return ''
+    return str(int(time.time() // settings.REPLICA_CACHE_TIMEOUT))
+
+
+def validators(request, name, scopes):
+    """ETag и Last-Modified страницы по версиям её областей из кеша."""
+    versions = get_versions(scopes)
+    parts = [
+        name,
+        str(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.get_full_path(),
+        replica_bucket(),
+    ] + [str(version) for version in versions]
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag, max(versions) // 10 ** 9
+
+
+def stale_key(request, name):
+    raw = '|'.join([name, _variant(request), request.get_full_path()])
+    return 'feed-stale:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cacheable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    if response.cookies:
+        return False
+    return not (
+        request.META.get('CSRF_COOKIE_USED')
+        and settings.CSRF_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _timeout():
+    # Реплика может отставать от сброса версии, поэтому собранная по ней
+    # страница живёт в кеше недолго.
+    if reading_from_replica():
+        return settings.REPLICA_CACHE_TIMEOUT
+    return settings.FEED_CACHE_TIMEOUT
+
+
+def _fresh(entry):
+    return entry is not None and entry['fresh_until'] > time.time()
+
+
+def _store(request, keys, response, tags):
+    if not _cacheable(request, response):
+        return
+    timeout = _timeout()
+    entry = {
+        'response': response,
+        'tags': tags,
+        'fresh_until': time.time() + timeout,
+    }
+    cache.set_many(
+        {key: entry for key in keys}, timeout + settings.CACHE_STALE_TIMEOUT
+    )
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if _fresh(entry):
+            return entry
+    return None
+
+
+def _single_flight():
+    return settings.CACHES['default']['BACKEND'] in SINGLE_FLIGHT_BACKENDS
+
+
+def get_or_render(request, key, fallback_key, render, tags):
+    """Отдаёт страницу из кеша, пересобирая её только в одном процессе.
+
+    Пока страницу пересобирает другой процесс, запрос получает
+    устаревшую копию: по тому же ключу или прошлую версию страницы.
+    Прошлая версия не отдаётся тому, кто только что писал в базу, а при
+    настроенной реплике он получает страницу, собранную с primary: копия
+    в кеше могла быть собрана по отставшей реплике. Вместе со страницей
+    возвращаются ETag и Last-Modified, с которыми она была собрана.
+    """
+    if PIN_COOKIE in request.COOKIES and REPLICA in settings.DATABASES:
+        request.page_cache = 'bypass'
+        response = render()
+        _store(request, [key, fallback_key], response, tags)
+        return response, tags
+    entry = cache.get(key)
+    if _fresh(entry):
+        request.page_cache = 'hit'
+        return entry['response'], entry['tags']
+    if not _single_flight():
+        request.page_cache = 'miss'
+        response = render()
+        _store(request, [key, fallback_key], response, tags)
+        return response, tags
+    lock = key + ':lock'
+    if not cache.add(lock, 1, settings.CACHE_LOCK_TIMEOUT):
+        if entry is None and PIN_COOKIE not in request.COOKIES:
+            entry = cache.get(fallback_key)
+        entry = entry or _wait_for(key)
+        if entry is not None:
+            request.page_cache = 'stale'
+            return entry['response'], entry['tags']
+        request.page_cache = 'miss'
+        return render(), tags
+    request.page_cache = 'miss'
+    try:
+        response = render()
+        _store(request, [key, fallback_key], response, tags)
+    finally:
+        cache.delete(lock)
+    return response, tags
+
+
+def cached_view(dependencies, shared=False):
+    """Кеширует ответ, пока не изменится версия одной из его областей.
+
+    dependencies(request, *args, **kwargs) возвращает список областей
+    или None, если страницу кешировать не нужно. С shared=True страница
+    кешируется одна на всех пользователей, а их фрагменты из тега hole
+    подставляются после чтения из кеша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = dependencies(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = validators(request, view.__name__, scopes)
+            not_modified = get_conditional_response(
+                request, etag=f'"{etag}"', last_modified=last_modified
+            )
+            if not_modified is not None:
+                request.page_cache = 'not_modified'
+                not_modified['ETag'] = f'"{etag}"'
+                return not_modified
+            request.punch_holes = shared
+            try:
+                response, (etag, last_modified) = get_or_render(
+                    request,
+                    page_key(request, view.__name__, scopes),
+                    stale_key(request, view.__name__),
+                    lambda: view(request, *args, **kwargs),
+                    (etag, last_modified),
+                )
+            finally:
+                request.punch_holes = False
+            if response.status_code != 200:
+                return response
+            if shared:
+                response.content = fill_holes(
+                    request, response.content.decode(response.charset)
+                )
+            response['ETag'] = f'"{etag}"'
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters
+from .cache import bump
+from .models import Comment, Post, User
+
+logger = logging.getLogger(__name__)
+
+# Очередь - каталог на диске: комментарий ждёт в new/, а процесс, который
+# записывает пачку, сначала забирает файл переименованием в cur/. В имени
+# файла есть id автора, чтобы найти его комментарии без чтения очереди.
+# Имя файла сохраняется в комментарии: файл, записанный в базу, но не
+# удалённый из-за падения процесса, при повторной записи пропускается.
+NEW: str = 'new'
+CLAIMED: str = 'cur'
+PENDING_TIMEOUT: int = 60 * 60
+
+_executor = None
+_lock = threading.Lock()
+_scheduled = False
+
+
+def _path(state, name=''):
+    return os.path.join(settings.COMMENT_QUEUE_DIR, state, name)
+
+
+def _pending_key(user_id):
+    return f'pending-comments:{user_id}'
+
+
+def enqueue(post_id, user, text):
+    """Кладёт комментарий в очередь на диске и планирует запись в базу."""
+    for state in (NEW, CLAIMED):
+        os.makedirs(_path(state), exist_ok=True)
+    created = timezone.now()
+    name = f'{time.time_ns()}-{user.pk}-{uuid.uuid4().hex}.json'
+    record = {
+        'post': post_id,
+        'author': user.pk,
+        'created': created.isoformat(),
+        'text': text,
+    }
+    temporary = _path(NEW, '.' + name)
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(record, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.rename(temporary, _path(NEW, name))
+    cache.set(_pending_key(user.pk), True, PENDING_TIMEOUT)
+    schedule()
+    return name
+
+
+def _read(state, name):
+    with open(_path(state, name), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def pending(user, post_id):
+    """Комментарии пользователя к посту, которые ещё не записаны в базу.
+
+    Нужны, чтобы автор сразу видел свой комментарий на странице поста.
+    Метка в кеше только избавляет остальных от чтения каталога очереди.
+    """
+    if not user.is_authenticated or not cache.get(_pending_key(user.pk)):
+        return []
+    records = []
+    for state in (NEW, CLAIMED):
+        try:
+            names = os.listdir(_path(state))
+        except FileNotFoundError:
+            continue
+        for name in names:
+            parts = name.split('-')
+            if len(parts) != 3 or parts[1] != str(user.pk):
+                continue
+            try:
+                records.append(_read(state, name))
+            except FileNotFoundError:
+                continue
+    return [
+        Comment(
+            post_id=record['post'],
+            author=user,
+            created=parse_datetime(record['created']),
+            text=record['text'],
+        )
+        for record in sorted(records, key=lambda record: record['created'])
+        if record['post'] == post_id
+    ]
+
+
+def _recover():
+    # Файлы, которые забрал упавший процесс, возвращаются в очередь.
+    deadline = time.time() - settings.COMMENT_CLAIM_TIMEOUT
+    for name in os.listdir(_path(CLAIMED)):
+        try:
+            if os.path.getmtime(_path(CLAIMED, name)) < deadline:
+                os.rename(_path(CLAIMED, name), _path(NEW, name))
+        except FileNotFoundError:
+            pass
+
+
+def _claim(limit):
+    claimed = []
+    for name in sorted(os.listdir(_path(NEW))):
+        if len(claimed) >= limit:
+            break
+        if name.startswith('.'):
+            continue
+        try:
+            os.utime(_path(NEW, name))
+            os.rename(_path(NEW, name), _path(CLAIMED, name))
+        except FileNotFoundError:
+            continue
+        claimed.append(name)
+    return claimed
+
+
+def flush(limit=None):
+    """Записывает пачку комментариев из очереди одной транзакцией.
+
+    Счётчики комментариев и версии кеша постов меняются один раз на пачку.
+    Файлы, уже записанные в базу, повторно не пишутся. Возвращает число
+    файлов, взятых из очереди.
+    """
+    if not os.path.isdir(_path(NEW)):
+        return 0
+    _recover()
+    names = _claim(limit or settings.COMMENT_BATCH_SIZE)
+    if not names:
+        return 0
+    records = {name: _read(CLAIMED, name) for name in names}
+    posts = set(Post.objects.filter(
+        pk__in={record['post'] for record in records.values()}
+    ).values_list('pk', flat=True))
+    authors = set(User.objects.filter(
+        pk__in={record['author'] for record in records.values()}
+    ).values_list('pk', flat=True))
+    with transaction.atomic():
+        written = set(Comment.objects.filter(
+            queue_name__in=names
+        ).values_list('queue_name', flat=True))
+        comments = [
+            Comment(
+                post_id=record['post'],
+                author_id=record['author'],
+                created=parse_datetime(record['created']),
+                text=record['text'],
+                queue_name=name,
+            )
+            for name, record in records.items()
+            if name not in written
+            and record['post'] in posts and record['author'] in authors
+        ]
+        per_post = {}
+        for comment in comments:
+            per_post[comment.post_id] = per_post.get(comment.post_id, 0) + 1
+        Comment.objects.bulk_create(comments, ignore_conflicts=True)
+        for post_id, count in per_post.items():
+            counters.change_comments_count(post_id, count)
+        bump(*(('post', post_id) for post_id in per_post))
+    for name in names:
+        try:
+            os.remove(_path(CLAIMED, name))
+        except FileNotFoundError:
+            pass
+    return len(names)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='comments'
+        )
+    return _executor
+
+
+def _run():
+    global _scheduled
+    time.sleep(settings.COMMENT_FLUSH_DELAY)
+    with _lock:
+        _scheduled = False
+    try:
+        while flush():
+            pass
+    except Exception:
+        logger.exception('Не удалось записать комментарии из очереди')
+    finally:
+        close_old_connections()
+
+
+def schedule():
+    """Запускает фоновую запись очереди, если она ещё не запланирована."""
+    global _scheduled
+    if not settings.COMMENTS_FLUSH_ASYNC:
+        return
+    with _lock:
+        if _scheduled:
+            return
+        _scheduled = True
+    get_executor().submit(_run)
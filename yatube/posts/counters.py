@@ -0,0 +1,81 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Follow, Post, User
+
+COUNTER_SOURCES = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _shifted(name, delta):
+    # Счётчик, разошедшийся с базой, не уходит ниже нуля.
+    return Greatest(F(name) + delta, 0)
+
+
+def change_author_stats(user_id, **deltas):
+    updates = {name: _shifted(name, delta) for name, delta in deltas.items()}
+    updated = AuthorStats.objects.filter(user_id=user_id).update(**updates)
+    if updated or min(deltas.values()) < 0:
+        return
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(user_id=user_id, **deltas)
+    except IntegrityError:
+        AuthorStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', delta)
+    )
+
+
+def _actual_author_stats():
+    actual = {}
+    for name, (model, field) in COUNTER_SOURCES.items():
+        rows = (
+            model.objects.order_by().values(field)
+            .annotate(count=Count('pk')).values_list(field, 'count')
+        )
+        for user_id, count in rows.iterator():
+            actual.setdefault(user_id, {})[name] = count
+    return actual
+
+
+def find_mismatches():
+    actual = _actual_author_stats()
+    mismatches = []
+    stored = {
+        stats.user_id: stats for stats in AuthorStats.objects.iterator()
+    }
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        stats = stored.get(user_id)
+        for name in COUNTER_SOURCES:
+            expected = actual.get(user_id, {}).get(name, 0)
+            current = getattr(stats, name) if stats else None
+            if current != expected:
+                mismatches.append(('user', user_id, name, current, expected))
+    posts = Post.objects.order_by().annotate(actual=Count('comments')).exclude(
+        comments_count=F('actual')
+    ).values_list('id', 'comments_count', 'actual')
+    for post_id, current, expected in posts.iterator():
+        mismatches.append(
+            ('post', post_id, 'comments_count', current, expected)
+        )
+    return mismatches
+
+
+def repair(mismatches):
+    for kind, pk, name, current, expected in mismatches:
+        if kind == 'post':
+            Post.objects.filter(pk=pk).update(**{name: expected})
+        elif current is None:
+            AuthorStats.objects.update_or_create(
+                user_id=pk, defaults={name: expected}
+            )
+        else:
+            AuthorStats.objects.filter(user_id=pk).update(**{name: expected})
@@ -0,0 +1,351 @@
+import base64
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import feed, follow_graph, thumbnails
+from .cache import GLOBAL, bump
+from .counters import find_mismatches, repair
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+BATCH_SIZE: int = 1000
+
+# Порядок важен: посты ссылаются на авторов и группы, комментарии на посты.
+FIELDS = {
+    'user': ('username', 'first_name', 'last_name', 'email', 'date_joined'),
+    'group': ('slug', 'title', 'description'),
+    'post': ('id', 'author', 'group', 'pub_date', 'text', 'image'),
+    'comment': ('post', 'author', 'created', 'text'),
+    'follow': ('user', 'author'),
+}
+EXPORT_COLUMNS = {
+    'user': FIELDS['user'],
+    'group': FIELDS['group'],
+    'post': (
+        'id', 'author__username', 'group__slug', 'pub_date', 'text', 'image'
+    ),
+    'comment': ('post_id', 'author__username', 'created', 'text'),
+    'follow': ('user__username', 'author__username'),
+}
+MODELS = {
+    'user': User,
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+CSV_FILES = {f'{model}s.csv': model for model in FIELDS}
+
+
+def _export_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _image_data(name):
+    if not name or not default_storage.exists(name):
+        return None
+    with default_storage.open(name) as image:
+        return base64.b64encode(image.read()).decode()
+
+
+def export_records(with_images=False):
+    """Отдаёт записи всех моделей по одной, не загружая таблицы в память."""
+    for model, columns in EXPORT_COLUMNS.items():
+        rows = MODELS[model].objects.order_by('pk').values_list(*columns)
+        for values in rows.iterator(chunk_size=BATCH_SIZE):
+            row = dict(zip(FIELDS[model], map(_export_value, values)))
+            if model == 'post' and with_images:
+                row['image_data'] = _image_data(row['image'])
+            yield model, row
+
+
+def write_ndjson(records, stream):
+    for model, row in records:
+        line = json.dumps({'model': model, **row}, ensure_ascii=False)
+        stream.write(line + '\n')
+
+
+def write_csv(records, directory):
+    files, writers = {}, {}
+    try:
+        for model, row in records:
+            if model not in writers:
+                files[model] = open(
+                    os.path.join(directory, f'{model}s.csv'), 'w',
+                    newline='', encoding='utf-8',
+                )
+                writers[model] = csv.DictWriter(files[model], list(row))
+                writers[model].writeheader()
+            writers[model].writerow(row)
+    finally:
+        for file in files.values():
+            file.close()
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            row = json.loads(line)
+            yield row.pop('model'), row
+
+
+def read_csv(path):
+    model = CSV_FILES[os.path.basename(path)]
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            yield model, {name: value or None for name, value in row.items()}
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    return date
+
+
+class Importer:
+    """Загружает записи пачками: одна пачка - один bulk_create и транзакция.
+
+    Авторы и группы ищутся по словарям username -> id и slug -> id. Посты
+    получают id не меньше, чем в файле, и больше всех уже занятых: в пустую
+    базу они ложатся с прежними id, а в заполненной не конфликтуют с
+    существующими. Комментарии находят свои посты по словарю id из файла
+    -> id в базе; в словаре только посты, получившие новый id, так что при
+    загрузке в пустую базу память на посты не тратится.
+
+    Сигналы при bulk_create не приходят, поэтому ленты подписчиков
+    заполняются один раз в finish(), после исправления счётчиков, когда
+    известно, кто из авторов популярен.
+
+    Пользователи, группы и подписки, которые уже есть в базе, пропускаются,
+    а посты и комментарии - нет: повторная загрузка того же файла создаст
+    их копии.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, report=None):
+        self.batch_size = batch_size
+        self.report = report or (lambda model, count, rate: None)
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.post_ids = {}
+        self.remapped = set()
+        self.next_post_id = (
+            Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        self.first_post_id = self.next_post_id
+        self.model = None
+        self.buffer = []
+        self.counts = dict.fromkeys(FIELDS, 0)
+        self.rows = dict.fromkeys(FIELDS, 0)
+        self.started = None
+        self.authors = set()
+        self.slugs = set()
+
+    def user_id(self, username):
+        if username not in self.users:
+            user, _ = User.objects.get_or_create(username=username)
+            self.users[username] = user.pk
+        return self.users[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            group, _ = Group.objects.get_or_create(
+                slug=slug, defaults={'title': slug, 'description': ''}
+            )
+            self.groups[slug] = group.pk
+        self.slugs.add(slug)
+        return self.groups[slug]
+
+    def build_user(self, row):
+        if row['username'] in self.users:
+            return None
+        return User(
+            username=row['username'],
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            email=row.get('email') or '',
+            date_joined=_date(row.get('date_joined')),
+            password=make_password(None),
+        )
+
+    def build_group(self, row):
+        if row['slug'] in self.groups:
+            return None
+        return Group(
+            slug=row['slug'],
+            title=row['title'],
+            description=row.get('description') or '',
+        )
+
+    def build_post(self, row):
+        image = row.get('image') or ''
+        if row.get('image_data'):
+            image = default_storage.save(
+                image, ContentFile(base64.b64decode(row['image_data']))
+            )
+        self.authors.add(row['author'])
+        post_id = max(int(row.get('id') or 0), self.next_post_id)
+        self.next_post_id = post_id + 1
+        if row.get('id') and int(row['id']) != post_id:
+            self.post_ids[int(row['id'])] = post_id
+            self.remapped.add(post_id)
+        return Post(
+            id=post_id,
+            author_id=self.user_id(row['author']),
+            group_id=self.group_id(row.get('group')),
+            pub_date=_date(row.get('pub_date')),
+            text=row['text'],
+            image=image,
+        )
+
+    def imported_post_id(self, file_id):
+        if file_id in self.post_ids:
+            return self.post_ids[file_id]
+        # Пост с прежним id лежит среди загруженных, если этот id не отдан
+        # другому посту из файла.
+        if (self.first_post_id <= file_id < self.next_post_id
+                and file_id not in self.remapped):
+            return file_id
+        return None
+
+    def build_comment(self, row):
+        post_id = self.imported_post_id(int(row['post']))
+        if post_id is None:
+            raise ValueError(f'Пост {row["post"]} не найден среди загруженных')
+        return Comment(
+            post_id=post_id,
+            author_id=self.user_id(row['author']),
+            created=_date(row.get('created')),
+            text=row['text'],
+        )
+
+    def build_follow(self, row):
+        self.authors.add(row['author'])
+        return Follow(
+            user_id=self.user_id(row['user']),
+            author_id=self.user_id(row['author']),
+        )
+
+    def add(self, model, row):
+        if model not in FIELDS:
+            raise ValueError(f'Неизвестный тип записи: {model}')
+        if model != self.model:
+            self.flush()
+            self.model = model
+            self.started = time.monotonic()
+        self.rows[model] += 1
+        try:
+            obj = getattr(self, f'build_{model}')(row)
+        except KeyError as error:
+            raise ValueError(f'{model} №{self.rows[model]}: нет поля {error}')
+        except ValueError as error:
+            raise ValueError(f'{model} №{self.rows[model]}: {error}')
+        if obj is not None:
+            self.buffer.append(obj)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        objs, self.buffer = self.buffer, []
+        with transaction.atomic():
+            MODELS[self.model].objects.bulk_create(
+                objs, ignore_conflicts=self.model == 'follow'
+            )
+            getattr(self, f'after_{self.model}', lambda objs: None)(objs)
+        self.counts[self.model] += len(objs)
+        rate = self.counts[self.model] / (time.monotonic() - self.started)
+        self.report(self.model, self.counts[self.model], rate)
+
+    def after_user(self, users):
+        names = [user.username for user in users]
+        self.users.update(
+            User.objects.filter(username__in=names).values_list(
+                'username', 'id'
+            )
+        )
+        AuthorStats.objects.bulk_create(
+            (AuthorStats(user_id=self.users[name]) for name in names),
+            ignore_conflicts=True,
+        )
+
+    def after_group(self, groups):
+        self.groups.update(
+            Group.objects.filter(
+                slug__in=[group.slug for group in groups]
+            ).values_list('slug', 'id')
+        )
+
+    def after_comment(self, comments):
+        bump(*(('post', post_id) for post_id in {
+            comment.post_id for comment in comments
+        }))
+
+    def after_follow(self, follows):
+        follow_graph.forget(
+            {follow.user_id for follow in follows},
+            {follow.author_id for follow in follows},
+        )
+
+    def fill_feeds(self):
+        # bulk_create не вызывает сигналы: раскладываем посты загруженных
+        # авторов по лентам сами, когда счётчики подписчиков уже исправлены
+        # и известно, кто из авторов популярен. Повторы записей ленты
+        # пропускаются.
+        feed.forget_popular_authors()
+        author_ids = sorted(self.users[name] for name in self.authors)
+        for start in range(0, len(author_ids), self.batch_size):
+            feed.fill_feeds(Follow.objects.filter(
+                author_id__in=author_ids[start:start + self.batch_size]
+            ))
+
+    def schedule_thumbnails(self):
+        # Миниатюры картинок загруженных постов тоже заказываем сами:
+        # сигнал post_save при bulk_create не приходит. Картинки, файлов
+        # которых нет в хранилище (выгрузка без --images), пропускаются.
+        for start in range(
+            self.first_post_id, self.next_post_id, self.batch_size
+        ):
+            images = list(
+                Post.objects.filter(
+                    pk__gte=start, pk__lt=start + self.batch_size,
+                    thumbnails='',
+                ).exclude(image='').values_list('pk', 'image')
+            )
+            for post_id, name in images:
+                if default_storage.exists(name):
+                    thumbnails.schedule(post_id)
+
+    def finish(self):
+        self.flush()
+        # Посты пришли со своими id: сдвигаем последовательность, иначе
+        # PostgreSQL выдаст новому посту уже занятый id.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
+        repair(find_mismatches())
+        self.fill_feeds()
+        self.schedule_thumbnails()
+        bump(
+            GLOBAL,
+            *(('author', username) for username in self.authors),
+            *(('group', slug) for slug in self.slugs),
+        )
+        return self.counts
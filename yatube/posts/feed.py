@@ -0,0 +1,157 @@
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from . import follow_graph
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .utils import (AMOUNT_POSTS, POST_KEYS, MergedKeysetPaginator,
+                    get_page, link_pages)
+
+FEED_KEYS: tuple = ('pub_date', 'post_id')
+BATCH_SIZE: int = 500
+
+
+def _popular_key():
+    return f'popular-authors:{settings.FEED_FANOUT_LIMIT}'
+
+
+def forget_popular_authors():
+    cache.delete(_popular_key())
+
+
+def popular_authors():
+    """ID авторов, чьи посты не раскладываются по лентам.
+
+    Их немного, поэтому множество целиком недолго живёт в кеше. И запись,
+    и чтение ленты решают по нему, иначе автор, только что ставший
+    популярным, пропал бы из лент до обновления множества.
+    """
+    key = _popular_key()
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(AuthorStats.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('user_id', flat=True))
+        cache.set(key, ids, settings.POPULAR_AUTHORS_TIMEOUT)
+    return ids
+
+
+def is_popular(author_id):
+    return author_id in popular_authors()
+
+
+def popular_author_ids(user):
+    return list(follow_graph.following(user.pk) & popular_authors())
+
+
+def fan_out_post(post):
+    if is_popular(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    if is_popular(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fill_feeds(follows):
+    """Раскладывает посты авторов из подписок follows одним INSERT ... SELECT.
+
+    Нужна для массовой загрузки, где поштучный bulk_create записей ленты
+    слишком медленный.
+    """
+    rows = follows.filter(author__posts__isnull=False).exclude(
+        author_id__in=popular_authors()
+    ).order_by().values_list(
+        'user_id', 'author__posts__id', 'author__posts__pub_date'
+    )
+    select, params = rows.query.sql_with_params()
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {FeedEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) {select} {suffix}',
+            params,
+        )
+
+
+def prune(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def popular_sources(popular):
+    """Выборки постов популярных авторов для MergedKeysetPaginator.
+
+    Каждый из первых FEED_MERGE_AUTHORS авторов читается по своему индексу
+    (author, pub_date, id), остальные одним запросом: число запросов на
+    страницу не растёт с числом подписок.
+    """
+    limit = settings.FEED_MERGE_AUTHORS
+    popular = sorted(popular)
+    groups = [[author_id] for author_id in popular[:limit]]
+    if popular[limit:]:
+        groups.append(popular[limit:])
+    return [
+        Post.objects.for_feed().filter(author_id__in=group)
+        for group in groups
+    ]
+
+
+def get_follow_page(request):
+    """Лента подписок: записи ленты и посты популярных авторов.
+
+    Посты популярных авторов сливаются с записями ленты по курсору, вместо
+    одного запроса с OR по подзапросу, который не ложится ни на один
+    индекс. Номер страницы ?page=N читается тем же запросом с OR и OFFSET,
+    как и другие ленты с номерами страниц.
+    """
+    user = request.user
+    entries = FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+    popular = popular_author_ids(user)
+    if not popular:
+        page_obj = get_page(request, entries, keys=FEED_KEYS)
+        page_obj.object_list = [entry.post for entry in page_obj.object_list]
+        return page_obj
+    if 'page' in request.GET:
+        return get_page(request, Post.objects.for_feed().filter(
+            Q(id__in=entries.values('post_id')) | Q(author_id__in=popular)
+        ))
+    paginator = MergedKeysetPaginator(
+        [(entries, FEED_KEYS, attrgetter('post'))] + [
+            (posts, POST_KEYS) for posts in popular_sources(popular)
+        ],
+        AMOUNT_POSTS,
+    )
+    return link_pages(request, paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    ))
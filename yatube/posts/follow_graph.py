@@ -0,0 +1,152 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AuthorStats, Follow
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+# Поле подписки, по которому ищется множество, и поле его элементов.
+KINDS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+
+
+def _key(kind, owner_id):
+    return f'follow-graph:{kind}:{owner_id}'
+
+
+def _version_key(kind, owner_id):
+    return f'follow-graph-version:{kind}:{owner_id}'
+
+
+def load(kind, owner_ids):
+    """Множества ID для многих пользователей: из кеша, промахи одним запросом.
+
+    Множество хранится вместе с версией, прочитанной до запроса к базе.
+    Подписка увеличивает версию, поэтому множество, собранное до неё,
+    больше не используется. Множества больше FOLLOW_GRAPH_MAX_SET в кеш
+    не кладутся: их переписывание на каждую подписку дороже запроса.
+    """
+    owner_ids = set(owner_ids)
+    version_keys = {_version_key(kind, owner): owner for owner in owner_ids}
+    keys = {_key(kind, owner): owner for owner in owner_ids}
+    found = cache.get_many([*version_keys, *keys])
+    versions = {}
+    for key, owner in version_keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[owner] = found[key]
+    result = {}
+    for key, owner in keys.items():
+        entry = found.get(key)
+        if entry is not None and entry[0] == versions[owner]:
+            result[owner] = entry[1]
+    missing = owner_ids - set(result)
+    if not missing:
+        return result
+    field, member = KINDS[kind]
+    loaded = {owner: set() for owner in missing}
+    rows = Follow.objects.filter(**{f'{field}__in': missing}).values_list(
+        field, member
+    )
+    for owner, member_id in rows.iterator():
+        loaded[owner].add(member_id)
+    loaded = {owner: frozenset(ids) for owner, ids in loaded.items()}
+    cache.set_many(
+        {
+            _key(kind, owner): (versions[owner], ids)
+            for owner, ids in loaded.items()
+            if len(ids) <= settings.FOLLOW_GRAPH_MAX_SET
+        },
+        settings.FOLLOW_GRAPH_TIMEOUT,
+    )
+    result.update(loaded)
+    return result
+
+
+def following(user_id):
+    """На кого подписан пользователь."""
+    return load(FOLLOWING, [user_id])[user_id]
+
+
+def followers(user_id):
+    """Кто подписан на пользователя."""
+    return load(FOLLOWERS, [user_id])[user_id]
+
+
+def is_following(user_id, author_id):
+    return author_id in following(user_id)
+
+
+def _count(user_id, name):
+    # Число берётся из счётчиков, а не из множества: множество популярного
+    # автора слишком велико, чтобы читать его ради одной цифры.
+    return AuthorStats.objects.filter(user_id=user_id).values_list(
+        name, flat=True
+    ).first() or 0
+
+
+def followers_count(user_id):
+    return _count(user_id, 'followers_count')
+
+
+def following_count(user_id):
+    return _count(user_id, 'following_count')
+
+
+def _next_version(kind, owner_id):
+    key = _version_key(kind, owner_id)
+    cache.add(key, time.time_ns(), None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Версию вытеснили из кеша: новая всё равно не совпадёт со старой.
+        return None
+
+
+def _patch(kind, owner_id, member_id, added):
+    version = _next_version(kind, owner_id)
+    if version is None:
+        return
+    key = _key(kind, owner_id)
+    lock = key + ':lock'
+    if not cache.add(lock, 1, settings.CACHE_LOCK_TIMEOUT):
+        return
+    try:
+        entry = cache.get(key)
+        # Множество дописывается, только если оно было актуально до этой
+        # подписки и не вырастет больше FOLLOW_GRAPH_MAX_SET; иначе его
+        # перечитает из базы следующее обращение.
+        if (entry is not None and entry[0] == version - 1
+                and len(entry[1]) < settings.FOLLOW_GRAPH_MAX_SET):
+            ids = entry[1] | {member_id} if added else entry[1] - {member_id}
+            cache.set(key, (version, ids), settings.FOLLOW_GRAPH_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def changed(user_id, author_id, followed):
+    """Обновляет множества обоих пользователей.
+
+    Как и bump, сбрасывает их сразу, а после фиксации транзакции
+    дописывает изменение в множество, уже перечитанное из базы.
+    """
+    forget([user_id], [author_id])
+
+    def apply():
+        _patch(FOLLOWING, user_id, author_id, followed)
+        _patch(FOLLOWERS, author_id, user_id, followed)
+    transaction.on_commit(apply)
+
+
+def forget(user_ids=(), author_ids=()):
+    """Сбрасывает множества после массовой загрузки подписок без сигналов."""
+    for user_id in user_ids:
+        _next_version(FOLLOWING, user_id)
+    for author_id in author_ids:
+        _next_version(FOLLOWERS, author_id)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Comment, Post, Group
+from .images import normalize_upload
+from .models import Comment, Post, Group, User
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +10,12 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -19,3 +27,31 @@ class GroupForm(forms.ModelForm):
     class Meta:
         model = Group
         fields = ('title', 'slug', 'description', )
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        max_length=200,
+        label='Поиск',
+        help_text='Слова, которые должны встретиться в тексте поста.',
+    )
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+    )
+    author = forms.CharField(
+        max_length=150,
+        required=False,
+        label='Автор',
+    )
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Такого автора нет.')
+        return author
@@ -0,0 +1,173 @@
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, ImageSequence
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pillow_avif = None
+
+VARIANT_DIR: str = 'posts/variants'
+METADATA_KEYS: tuple = ('exif', 'xmp', 'XML:com.adobe.xmp')
+CARD_RATIO: float = 339 / 960
+
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 60}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'image/jpeg', {
+        'quality': 85, 'optimize': True, 'progressive': True
+    }),
+}
+
+
+UPLOAD_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def supported_formats():
+    Image.init()
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name != 'jpeg' and FORMATS[name][0] in Image.SAVE
+    ] + ['jpeg']
+
+
+def _encode(image, name):
+    pil_format, _, options = FORMATS[name]
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _store(path, content):
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.url(default_storage.save(path, content))
+
+
+def variant_dir(name):
+    # Хранилище даёт оригиналам уникальные имена, поэтому папка по полному
+    # имени оригинала не пересекается с вариантами других картинок.
+    return f'{VARIANT_DIR}/{name}'
+
+
+def delete_variants(name):
+    directory = variant_dir(name)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        default_storage.delete(f'{directory}/{file_name}')
+
+
+def make_variants(field_file):
+    """Режет картинку под карточку в нескольких ширинах и форматах.
+
+    Возвращает список источников для <picture> в порядке предпочтения,
+    последним идёт JPEG для браузеров без поддержки новых форматов.
+    """
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    directory = variant_dir(field_file.name)
+    sources = []
+    for name in supported_formats():
+        _, mime_type, _ = FORMATS[name]
+        srcset = []
+        for width in settings.POST_IMAGE_WIDTHS:
+            size = (width, round(width * CARD_RATIO))
+            resized = ImageOps.fit(image, size, Image.LANCZOS)
+            url = _store(
+                f'{directory}/{width}.{name}',
+                _encode(resized, name),
+            )
+            srcset.append(f'{url} {width}w')
+        sources.append({'type': mime_type, 'srcset': ', '.join(srcset)})
+    return sources
+
+
+def _open_upload(upload):
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %s.'
+            % filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        image = None
+    if image is None or (
+        image.width * image.height > settings.POST_IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError('Слишком большое разрешение картинки.')
+    return image
+
+
+def _frames(image, max_side):
+    """Кадры анимации, уменьшенные до max_side и без метаданных."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frame = frame.convert('RGBA')
+        frame.thumbnail((max_side, max_side), Image.LANCZOS)
+        for key in METADATA_KEYS:
+            frame.info.pop(key, None)
+        frames.append(frame)
+    return frames[0], {
+        'save_all': True,
+        'append_images': frames[1:],
+        'duration': durations,
+        'loop': image.info.get('loop', 0),
+    }
+
+
+def normalize_upload(upload):
+    """Уменьшает слишком большие картинки и вырезает из них EXIF.
+
+    Размер читается из заголовка без декодирования, JPEG декодируется сразу
+    в уменьшенном масштабе, крупный результат уходит во временный файл.
+    MPO с камер сохраняется как JPEG из первого кадра, у анимаций
+    уменьшается каждый кадр.
+    """
+    image = _open_upload(upload)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    oversized = max(image.size) > max_side
+    has_metadata = any(key in image.info for key in METADATA_KEYS)
+    if not (oversized or has_metadata):
+        upload.seek(0)
+        return upload
+    pil_format = 'JPEG' if image.format == 'MPO' else image.format
+    icc_profile = image.info.get('icc_profile')
+    options = dict(UPLOAD_OPTIONS.get(pil_format, {}))
+    if pil_format != 'JPEG' and getattr(image, 'is_animated', False):
+        image, animation = _frames(image, max_side)
+        options.update(animation)
+    else:
+        image.draft(image.mode, (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        for key in METADATA_KEYS:
+            image.info.pop(key, None)
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(buffer, pil_format, **options)
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadedFile(
+        buffer, upload.name, upload.content_type, size, upload.charset
+    )
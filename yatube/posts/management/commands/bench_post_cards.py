@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from posts.models import Group, Post, User
+from posts.utils import AMOUNT_POSTS
+
+from .benchmark import CACHE_MODES
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время отрисовки страницы ленты с холодным и прогретым '
+        'кешем карточек постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=AMOUNT_POSTS)
+
+    def render_page(self, request, posts):
+        return render_to_string(
+            'posts/index.html',
+            {'page_obj': posts, 'index': True},
+            request=request,
+        )
+
+    def measure(self, request, posts, repeat, mode):
+        # Кеш из CACHE_MODES: рабочий кеш не очищается и не заполняется.
+        timings = []
+        with override_settings(CACHES={'default': CACHE_MODES[mode]}):
+            self.render_page(request, posts)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                self.render_page(request, posts)
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, title, timings):
+        self.stdout.write(
+            f'{title}: медиана {statistics.median(timings):.3f} мс, '
+            f'среднее {statistics.mean(timings):.3f} мс'
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        try:
+            with transaction.atomic():
+                author = User.objects.create_user(username='bench_author')
+                group = Group.objects.create(
+                    title='Бенчмарк', slug='bench-cards', description='-'
+                )
+                Post.objects.bulk_create(
+                    Post(author=author, group=group, text=f'Пост {i}\n' * 20)
+                    for i in range(options['posts'])
+                )
+                posts = list(Post.objects.for_feed().filter(author=author))
+                cold = self.measure(request, posts, options['repeat'], 'cold')
+                warm = self.measure(request, posts, options['repeat'], 'warm')
+                raise Rollback
+        except Rollback:
+            pass
+        self.report('Без кеша карточек', cold)
+        self.report('С кешем карточек', warm)
+        speedup = statistics.median(cold) / statistics.median(warm)
+        self.stdout.write(f'Ускорение: {speedup:.1f}x')
@@ -0,0 +1,337 @@
+import json
+import os
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api import urls as api_urls
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, User
+
+BENCHMARK_DIR = os.path.join(settings.BASE_DIR, 'benchmarks')
+BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+RESULTS = os.path.join(BENCHMARK_DIR, 'results.json')
+
+# cold - без кеша страниц и фрагментов, warm - с кешем из настроек,
+# но в отдельном пространстве ключей, чтобы не трогать рабочий кеш.
+CACHE_MODES = {
+    'cold': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'warm': {**settings.CACHES['default'], 'KEY_PREFIX': 'benchmark'},
+}
+
+# JSON API и HTML-страницы с теми же данными: их замеры сравниваются.
+API_EQUIVALENTS = {
+    'api:post_list': 'posts:index',
+    'api:group_posts': 'posts:group_list',
+    'api:profile_posts': 'posts:profile',
+    'api:follow_posts': 'posts:follow_index',
+    'api:post_detail': 'posts:post_detail',
+    'api:comments': 'posts:post_comments',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def fetch(client, method, url, data):
+    # Потоковый ответ считается полученным, когда прочитан до конца.
+    response = getattr(client, method)(url, data)
+    if response.streaming:
+        return response, b''.join(response.streaming_content)
+    return response, response.content
+
+
+def percentile(timings, percent):
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p99 времени ответа и число запросов к базе для '
+        'каждого адреса posts/urls.py и api/urls.py и сравнивает с '
+        'сохранённым эталоном. '
+        'Данные для замера готовит seed_data, изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--output', default=RESULTS)
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Сохранить результаты как новый эталон.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост медианы времени ответа, доля.',
+        )
+
+    def sample(self):
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            raise CommandError(
+                'В базе нет постов: сначала выполните manage.py seed_data.'
+            )
+        reader = User.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows').first()
+        stranger = User.objects.exclude(pk__in=[
+            reader.pk, post.author_id
+        ]).exclude(following__user=reader).first() or post.author
+        group = Group.objects.annotate(
+            size=Count('posts')
+        ).order_by('-size').first()
+        return post, reader, stranger, group
+
+    def scenarios(self):
+        post, reader, stranger, group = self.sample()
+        author = Client()
+        author.force_login(post.author)
+        client = Client()
+        client.force_login(reader)
+        word = post.text.split()[0]
+        scenarios = {
+            'index': (client, 'get', reverse('posts:index'), None),
+            'profile': (
+                client, 'get',
+                reverse('posts:profile', args=[post.author.username]), None,
+            ),
+            'post_detail': (
+                client, 'get',
+                reverse('posts:post_detail', args=[post.id]), None,
+            ),
+            'post_comments': (
+                client, 'get',
+                reverse('posts:post_comments', args=[post.id]), None,
+            ),
+            'feed': (
+                client, 'get', reverse('posts:feed', args=['atom']), None,
+            ),
+            'profile_feed': (
+                client, 'get',
+                reverse('posts:profile_feed', args=[
+                    post.author.username, 'atom'
+                ]),
+                None,
+            ),
+            'search': (
+                client, 'get', reverse('posts:search') + f'?q={word}', None,
+            ),
+            'post_create': (author, 'get', reverse('posts:post_create'), None),
+            'group_create': (
+                author, 'get', reverse('posts:group_create'), None,
+            ),
+            'post_edit': (
+                author, 'get', reverse('posts:post_edit', args=[post.id]),
+                None,
+            ),
+            'add_comment': (
+                client, 'post',
+                reverse('posts:add_comment', args=[post.id]),
+                {'text': 'Комментарий из бенчмарка'},
+            ),
+            'follow_index': (
+                client, 'get', reverse('posts:follow_index'), None,
+            ),
+            'profile_follow': (
+                client, 'get',
+                reverse('posts:profile_follow', args=[stranger.username]),
+                None,
+            ),
+            'profile_unfollow': (
+                client, 'get',
+                reverse('posts:profile_unfollow', args=[stranger.username]),
+                None,
+            ),
+        }
+        if group is not None:
+            scenarios['group_list'] = (
+                client, 'get',
+                reverse('posts:group_list', args=[group.slug]), None,
+            )
+            scenarios['group_feed'] = (
+                client, 'get',
+                reverse('posts:group_feed', args=[group.slug, 'rss']), None,
+            )
+        scenarios = {
+            f'{posts_urls.app_name}:{name}': scenario
+            for name, scenario in scenarios.items()
+        }
+        scenarios.update(self.api_scenarios(client, post, stranger, group))
+        missing = {
+            f'{urls.app_name}:{pattern.name}'
+            for urls in (posts_urls, api_urls)
+            for pattern in urls.urlpatterns
+        } - set(scenarios)
+        for name in sorted(missing):
+            self.stderr.write(f'Нет сценария для {name}')
+        return scenarios
+
+    def api_scenarios(self, client, post, stranger, group):
+        scenarios = {
+            'api:post_list': (client, 'get', reverse('api:post_list'), None),
+            'api:profile_posts': (
+                client, 'get',
+                reverse('api:profile_posts', args=[post.author.username]),
+                None,
+            ),
+            'api:follow_posts': (
+                client, 'get', reverse('api:follow_posts'), None,
+            ),
+            'api:post_detail': (
+                client, 'get', reverse('api:post_detail', args=[post.id]),
+                None,
+            ),
+            'api:comments': (
+                client, 'get', reverse('api:comments', args=[post.id]), None,
+            ),
+            'api:follow': (
+                client, 'post',
+                reverse('api:follow', args=[stranger.username]), None,
+            ),
+        }
+        if group is not None:
+            scenarios['api:group_posts'] = (
+                client, 'get', reverse('api:group_posts', args=[group.slug]),
+                None,
+            )
+        return scenarios
+
+    def measure(self, scenarios, repeat):
+        timings = {name: [] for name in scenarios}
+        queries = {name: [] for name in scenarios}
+        statuses, sizes = {}, {}
+        # Первый проход прогревает загрузку шаблонов и кеш и не считается.
+        for client, method, url, data in scenarios.values():
+            fetch(client, method, url, data)
+        for _ in range(repeat):
+            for name, (client, method, url, data) in scenarios.items():
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response, content = fetch(client, method, url, data)
+                    elapsed = time.perf_counter() - start
+                timings[name].append(elapsed * 1000)
+                queries[name].append(len(captured))
+                statuses[name] = response.status_code
+                sizes[name] = len(content)
+        return {
+            name: {
+                'status': statuses[name],
+                'bytes': sizes[name],
+                'p50_ms': round(statistics.median(timings[name]), 3),
+                'p99_ms': round(percentile(timings[name], 99), 3),
+                'mean_ms': round(statistics.mean(timings[name]), 3),
+                'queries': max(queries[name]),
+            }
+            for name in scenarios
+        }
+
+    def compare_api(self, results):
+        for mode, urls in results.items():
+            for api, html in API_EQUIVALENTS.items():
+                if api not in urls or html not in urls:
+                    continue
+                self.stdout.write(
+                    f'{mode:4} {api:24} p50 {urls[api]["p50_ms"]:8.2f} мс, '
+                    f'{urls[api]["bytes"]} байт; {html}: '
+                    f'{urls[html]["p50_ms"]:.2f} мс, '
+                    f'{urls[html]["bytes"]} байт'
+                )
+
+    def dataset(self):
+        return {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        }
+
+    def run(self, repeat):
+        results = {}
+        try:
+            with transaction.atomic():
+                for mode, cache_settings in CACHE_MODES.items():
+                    with override_settings(
+                        CACHES={'default': cache_settings}, DEBUG=False
+                    ):
+                        results[mode] = self.measure(
+                            self.scenarios(), repeat
+                        )
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for mode, urls in results.items():
+            for name, current in urls.items():
+                base = baseline.get('results', {}).get(mode, {}).get(name)
+                if base is None:
+                    continue
+                limit = base['p50_ms'] * (1 + tolerance)
+                change = current['p50_ms'] / base['p50_ms'] - 1
+                line = (
+                    f'{mode:4} {name:24} p50 {current["p50_ms"]:8.2f} мс '
+                    f'({change:+.0%}), p99 {current["p99_ms"]:8.2f} мс, '
+                    f'запросов {current["queries"]} '
+                    f'(было {base["queries"]})'
+                )
+                if current['p50_ms'] > limit:
+                    regressions.append(f'{mode} {name}: медиана времени')
+                if current['queries'] > base['queries']:
+                    regressions.append(f'{mode} {name}: число запросов')
+                self.stdout.write(line)
+        return regressions
+
+    def write(self, path, report):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def handle(self, *args, **options):
+        report = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'repeat': options['repeat'],
+            'dataset': self.dataset(),
+            'results': self.run(options['repeat']),
+        }
+        self.write(options['output'], report)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+        self.compare_api(report['results'])
+        if options['save_baseline']:
+            self.write(options['baseline'], report)
+            self.stdout.write(f'Эталон сохранён в {options["baseline"]}')
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write('Эталона нет, сравнивать не с чем.')
+            return
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = self.compare(
+            report['results'], baseline, options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно эталона:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exchange import export_records, write_csv, write_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'потоком в NDJSON или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для NDJSON (по умолчанию stdout) или каталог для CSV.',
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='Вложить содержимое картинок в записи постов (base64).',
+        )
+
+    def handle(self, *args, **options):
+        records = export_records(with_images=options['images'])
+        output = options['output']
+        if options['format'] == 'csv':
+            if output == '-':
+                raise CommandError('Для CSV укажите каталог в --output.')
+            os.makedirs(output, exist_ok=True)
+            write_csv(records, output)
+        elif output == '-':
+            write_ndjson(records, self.stdout)
+        else:
+            with open(output, 'w', encoding='utf-8') as stream:
+                write_ndjson(records, stream)
+        if output != '-':
+            self.stderr.write(f'Выгрузка записана в {output}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает в базу комментарии из очереди на диске, например '
+        'оставшиеся после остановки сервера.'
+    )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            flushed = comment_queue.flush()
+            if not flushed:
+                break
+            total += flushed
+        self.stdout.write(f'Из очереди взято комментариев: {total}')
@@ -0,0 +1,61 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.exchange import (BATCH_SIZE, CSV_FILES, FIELDS, Importer,
+                            read_csv, read_ndjson)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON или CSV из export_data пачками bulk_create. '
+        'CSV-файлы должны называться users.csv, groups.csv, posts.csv, '
+        'comments.csv и follows.csv. Повторная загрузка того же файла '
+        'создаёт копии постов и комментариев.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+', help='Файлы NDJSON или CSV, "-" для stdin.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def report(self, model, count, rate):
+        self.stderr.write(f'{model}: {count} записей, {rate:.0f} в секунду')
+
+    def records(self, path):
+        if path == '-':
+            yield from read_ndjson(sys.stdin)
+        elif path.endswith('.csv'):
+            yield from read_csv(path)
+        else:
+            with open(path, encoding='utf-8') as stream:
+                yield from read_ndjson(stream)
+
+    def position(self, path):
+        # CSV загружаются в порядке зависимостей: пользователи, группы,
+        # посты, комментарии, подписки.
+        if not path.endswith('.csv'):
+            return -1
+        name = os.path.basename(path)
+        if name not in CSV_FILES:
+            raise CommandError(f'Неизвестный CSV-файл: {path}')
+        return list(FIELDS).index(CSV_FILES[name])
+
+    def handle(self, *args, **options):
+        paths = sorted(options['paths'], key=self.position)
+        importer = Importer(options['batch_size'], self.report)
+        try:
+            for path in paths:
+                for model, row in self.records(path):
+                    importer.add(model, row)
+        except (ValueError, KeyError, IntegrityError) as error:
+            raise CommandError(f'Ошибка в данных: {error}')
+        counts = importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено: ' + ', '.join(
+                f'{model} {count}' for model, count in counts.items()
+            )
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.counters import find_mismatches, repair
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и пересчитывает денормализованные счётчики.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счётчики, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = find_mismatches()
+        for kind, pk, name, current, expected in mismatches:
+            self.stdout.write(
+                f'{kind} {pk}: {name} = {current}, ожидалось {expected}'
+            )
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений в счётчиках: {len(mismatches)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Счётчики в порядке'))
+            return
+        repair(mismatches)
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {len(mismatches)}')
+        )
@@ -0,0 +1,155 @@
+import datetime
+import itertools
+import random
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from posts.exchange import Importer
+from posts.models import Group, Post, User
+
+# Показатель степенного распределения: немногие авторы пишут большую часть
+# постов и собирают большую часть подписчиков, как в живых соцсетях.
+ZIPF_EXPONENT: float = 1.1
+SEED_PREFIX: str = 'seed'
+
+
+def zipf_weights(count):
+    # Накопленные веса: random.choices с cum_weights выбирает за log(n).
+    return list(itertools.accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными данными для нагрузочных тестов: '
+        'пользователи и группы от mixer, тексты от Faker, посты и подписки '
+        'со степенным распределением по авторам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=200_000)
+        parser.add_argument('--comments', type=int, default=100_000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def report(self, model, count, rate):
+        self.stderr.write(f'{model}: {count} записей, {rate:.0f} в секунду')
+
+    def users(self, mixer, count):
+        users = mixer.cycle(count).blend(User, username=mixer.sequence(
+            lambda number: f'{SEED_PREFIX}{number}_{self.faker.user_name()}'
+        ))
+        for user in users:
+            yield 'user', {
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'email': user.email,
+                'date_joined': None,
+            }
+
+    def groups(self, mixer, count):
+        groups = mixer.cycle(count).blend(
+            Group, slug=mixer.sequence(f'{SEED_PREFIX}-{{0}}')
+        )
+        for group in groups:
+            yield 'group', {
+                'slug': group.slug,
+                'title': group.title[:200],
+                'description': self.faker.paragraph(),
+            }
+
+    def posts(self, options, usernames, slugs, first_id):
+        # Плодовитость авторов не связана с числом их подписчиков, иначе
+        # раскладка по лентам вырастает до десятков миллионов записей.
+        authors = usernames[:]
+        self.random.shuffle(authors)
+        weights = zipf_weights(len(authors))
+        start = timezone.now() - datetime.timedelta(days=options['days'])
+        step = datetime.timedelta(days=options['days']) / options['posts']
+        for number in range(options['posts']):
+            yield 'post', {
+                'id': first_id + number,
+                'author': self.random.choices(
+                    authors, cum_weights=weights
+                )[0],
+                'group': (
+                    self.random.choice(slugs)
+                    if slugs and self.random.random() < 0.6 else None
+                ),
+                'pub_date': (start + step * number).isoformat(),
+                'text': self.faker.text(self.random.randint(80, 1200)),
+                'image': '',
+            }
+
+    def comments(self, options, usernames, post_ids):
+        weights = zipf_weights(len(post_ids))
+        # Самые обсуждаемые - свежие посты.
+        recent = post_ids[::-1]
+        for _ in range(options['comments']):
+            yield 'comment', {
+                'post': self.random.choices(recent, cum_weights=weights)[0],
+                'author': self.random.choice(usernames),
+                'created': None,
+                'text': self.faker.sentence(),
+            }
+
+    def follows(self, options, usernames):
+        weights = zipf_weights(len(usernames))
+        for username in usernames:
+            count = min(
+                int(self.random.expovariate(1 / options['follows'])),
+                len(usernames) - 1,
+            )
+            authors = set(self.random.choices(
+                usernames, cum_weights=weights, k=count
+            ))
+            authors.discard(username)
+            for author in authors:
+                yield 'follow', {'user': username, 'author': author}
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        mixer = Mixer(commit=False, locale='ru')
+        importer = Importer(options['batch_size'], self.report)
+        for model, row in self.users(mixer, options['users']):
+            importer.add(model, row)
+        for model, row in self.groups(mixer, options['groups']):
+            importer.add(model, row)
+        importer.flush()
+        usernames = list(
+            User.objects.filter(username__startswith=SEED_PREFIX)
+            .order_by('pk').values_list('username', flat=True)
+        )
+        slugs = list(
+            Group.objects.filter(slug__startswith=f'{SEED_PREFIX}-')
+            .values_list('slug', flat=True)
+        )
+        for model, row in self.follows(options, usernames):
+            importer.add(model, row)
+        last = Post.objects.order_by('-pk').values_list('pk', flat=True)
+        first_id = (last.first() or 0) + 1
+        for model, row in self.posts(options, usernames, slugs, first_id):
+            importer.add(model, row)
+        post_ids = list(range(first_id, first_id + options['posts']))
+        for model, row in self.comments(options, usernames, post_ids):
+            importer.add(model, row)
+        counts = importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(
+                f'{model} {count}' for model, count in counts.items()
+            )
+        ))
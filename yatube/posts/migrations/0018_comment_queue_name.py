@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_timestamps_default_now'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='queue_name',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Файл в очереди комментариев'),
+        ),
+    ]
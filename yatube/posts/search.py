@@ -0,0 +1,206 @@
+import base64
+import binascii
+import json
+import re
+
+from django.db import connection
+
+from .models import Post
+from .utils import AMOUNT_POSTS, KeysetPage, get_page, link_pages
+
+FTS_TABLE: str = 'posts_post_fts'
+MIN_STEM: int = 3
+
+# Окончания для лёгкого стемминга русских слов: после отрезания окончания
+# слово ищется по префиксу, поэтому «котами» находит «кот», «кота», «коты».
+ENDINGS = sorted(
+    {
+        'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ого', 'его',
+        'ому', 'ему', 'ыми', 'ими', 'ешь', 'ишь', 'ете', 'ите', 'ует', 'уют',
+        'ать', 'ять', 'еть', 'ить', 'ыть', 'ала', 'ила', 'ыла', 'ена', 'ое',
+        'ее', 'ие', 'ые', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ую', 'юю', 'ом',
+        'ем', 'ым', 'им', 'ах', 'ях', 'ов', 'ев', 'ам', 'ям', 'ых', 'их', 'ия',
+        'ья', 'ию', 'ью', 'ет', 'ит', 'ут', 'ют', 'ат', 'ят', 'ть', 'ла', 'ли',
+        'ло', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    },
+    key=len,
+    reverse=True,
+)
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "text, content='', tokenize='unicode61 remove_diacritics 2')"
+)
+NORMALIZED = "replace(replace({0}.text, 'ё', 'е'), 'Ё', 'Е')"
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': (
+        f'AFTER INSERT ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, text) '
+        f'VALUES (new.id, {NORMALIZED.format("new")}); END'
+    ),
+    f'{FTS_TABLE}_ad': (
+        f'AFTER DELETE ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+        f"VALUES ('delete', old.id, {NORMALIZED.format('old')}); END"
+    ),
+    f'{FTS_TABLE}_au': (
+        f'AFTER UPDATE OF text ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+        f"VALUES ('delete', old.id, {NORMALIZED.format('old')}); "
+        f'INSERT INTO {FTS_TABLE}(rowid, text) '
+        f'VALUES (new.id, {NORMALIZED.format("new")}); END'
+    ),
+}
+
+
+def install(using_connection):
+    """Создаёт FTS5-индекс и триггеры, если их нет.
+
+    Перестройка таблицы posts_post миграциями SQLite удаляет триггеры,
+    поэтому функция вызывается после каждого migrate и при необходимости
+    переиндексирует посты заново.
+    """
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE %s",
+            [f'{FTS_TABLE}_%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing == set(TRIGGERS):
+            return
+        cursor.execute(CREATE_TABLE)
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'CREATE TRIGGER {name} {body}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) '
+            f'SELECT id, {NORMALIZED.format("posts_post")} FROM posts_post'
+        )
+
+
+def is_available():
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def terms(query):
+    return [
+        stem(word)
+        for word in re.findall(r'\w+', query.lower().replace('ё', 'е'))
+    ]
+
+
+def build_match(query):
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def _encode(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, post_id = json.loads(raw)
+        return float(score), int(post_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _ranked_ids(match, filters, params, seek, per_page):
+    where = [f'{FTS_TABLE} MATCH %s'] + filters
+    params = [match] + params
+    order = 'ASC'
+    if seek:
+        operator, values = seek
+        where.append(f'(bm25({FTS_TABLE}), p.id) {operator} (%s, %s)')
+        params.extend(values)
+        order = 'ASC' if operator == '>' else 'DESC'
+    sql = (
+        f'SELECT p.id, bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'JOIN posts_post p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {" AND ".join(where)} '
+        f'ORDER BY bm25({FTS_TABLE}) {order}, p.id {order} LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [per_page + 1])
+        return cursor.fetchall()
+
+
+def search_posts(query, group=None, author=None, after=None, before=None,
+                 per_page=AMOUNT_POSTS):
+    match = build_match(query)
+    if not match:
+        return KeysetPage([], False, False)
+    filters, params = [], []
+    if group is not None:
+        filters.append('p.group_id = %s')
+        params.append(group.pk)
+    if author is not None:
+        filters.append('p.author_id = %s')
+        params.append(author.pk)
+    before_values = before and _decode(before)
+    after_values = after and _decode(after)
+    if before_values:
+        rows = _ranked_ids(
+            match, filters, params, ('<', before_values), per_page
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        seek = ('>', after_values) if after_values else None
+        rows = _ranked_ids(match, filters, params, seek, per_page)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = bool(after_values)
+    if not rows:
+        return KeysetPage([], False, False)
+    posts = Post.objects.for_feed().in_bulk([post_id for post_id, _ in rows])
+    return KeysetPage(
+        [posts[post_id] for post_id, _ in rows if post_id in posts],
+        has_next,
+        has_previous,
+        next_cursor=_encode(rows[-1][::-1]) if has_next else None,
+        previous_cursor=_encode(rows[0][::-1]) if has_previous else None,
+    )
+
+
+def get_search_page(request, q, group=None, author=None):
+    if not is_available():
+        posts = Post.objects.for_feed()
+        for term in terms(q):
+            posts = posts.filter(text__icontains=term)
+        if group is not None:
+            posts = posts.filter(group=group)
+        if author is not None:
+            posts = posts.filter(author=author)
+        return get_page(request, posts)
+    page_obj = search_posts(
+        q,
+        group=group,
+        author=author,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return link_pages(request, page_obj)
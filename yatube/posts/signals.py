@@ -0,0 +1,162 @@
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import counters, feed, follow_graph, images, search, thumbnails
+from .cache import GLOBAL, bump, scopes_for_post
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+# Поля пользователя, которые видны на страницах: имя и адрес профиля.
+NAME_FIELDS: frozenset = frozenset(('username', 'first_name', 'last_name'))
+
+
+def _shows_name(update_fields):
+    # Вход сохраняет только last_login: страницы от этого не меняются.
+    return update_fields is None or bool(NAME_FIELDS & set(update_fields))
+
+
+def _author_groups(user_id):
+    return (
+        ('group', slug) for slug in Post.objects.filter(
+            author_id=user_id, group__isnull=False
+        ).values_list('group__slug', flat=True).distinct()
+    )
+
+
+def _group_authors(group_id):
+    return (
+        ('author', username) for username in User.objects.filter(
+            posts__group_id=group_id
+        ).values_list('username', flat=True).distinct()
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    if instance.pk and not raw and _shows_name(update_fields):
+        bump(*(
+            ('author', username) for username in User.objects.filter(
+                pk=instance.pk
+            ).values_list('username', flat=True)
+        ))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+    elif _shows_name(update_fields):
+        bump(
+            GLOBAL,
+            ('author', instance.username),
+            *_author_groups(instance.pk),
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        bump(*(
+            ('group', slug) for slug in Post.objects.filter(
+                pk=instance.pk
+            ).values_list('group__slug', flat=True)
+        ))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_author_stats(instance.author_id, posts_count=1)
+        feed.fan_out_post(instance)
+    if instance.image and not instance.thumbnail_urls:
+        thumbnails.schedule(instance.pk)
+    bump(*scopes_for_post(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, posts_count=-1)
+    bump(*scopes_for_post(instance))
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.delete_variants(name))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    bump(('post', instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    bump(('post', instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    # Название группы есть и в лентах её авторов.
+    if instance.pk and not raw:
+        bump(
+            *(
+                ('group', slug) for slug in Group.objects.filter(
+                    pk=instance.pk
+                ).values_list('slug', flat=True)
+            ),
+            *_group_authors(instance.pk),
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    bump(*_group_authors(instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(GLOBAL, ('group', instance.slug))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_author_stats(instance.author_id, followers_count=1)
+        counters.change_author_stats(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+        follow_graph.changed(instance.user_id, instance.author_id, True)
+        bump(
+            ('author', instance.author.username),
+            ('follow', instance.user_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, followers_count=-1)
+    counters.change_author_stats(instance.user_id, following_count=-1)
+    feed.prune(instance.user_id, instance.author_id)
+    follow_graph.changed(instance.user_id, instance.author_id, False)
+    bump(
+        ('author', instance.author.username),
+        ('follow', instance.user_id),
+    )
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install(connections[using])
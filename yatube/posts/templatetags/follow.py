@@ -0,0 +1,12 @@
+from django import template
+
+from posts import follow_graph
+
+register = template.Library()
+
+
+@register.filter
+def follows(user, author_id):
+    return user.is_authenticated and follow_graph.is_following(
+        user.pk, author_id
+    )
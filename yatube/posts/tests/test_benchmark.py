@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from api import urls as api_urls
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Post, User
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=3, posts=200, comments=50,
+            follows=5, stdout=StringIO(), stderr=StringIO(),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output = os.path.join(self.directory, 'results.json')
+        self.baseline = os.path.join(self.directory, 'baseline.json')
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark', repeat=2, output=self.output,
+            baseline=self.baseline, stdout=StringIO(), stderr=StringIO(),
+            **options,
+        )
+        with open(self.output, encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_seed_data_builds_follow_graph(self):
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+
+    def test_every_url_is_measured(self):
+        comments = Comment.objects.count()
+        report = self.benchmark(save_baseline=True)
+        self.assertEqual(report['dataset']['posts'], 200)
+        for mode in ('cold', 'warm'):
+            results = report['results'][mode]
+            self.assertEqual(
+                len(results),
+                len(posts_urls.urlpatterns) + len(api_urls.urlpatterns),
+            )
+            self.assertEqual(results['posts:index']['status'], 200)
+            self.assertGreater(results['posts:index']['queries'], 0)
+            self.assertEqual(results['api:post_list']['status'], 200)
+            self.assertLess(
+                results['api:post_list']['bytes'],
+                results['posts:index']['bytes'],
+            )
+        self.assertEqual(Comment.objects.count(), comments)
+        self.assertTrue(os.path.exists(self.baseline))
+
+    def test_query_regression_fails(self):
+        report = self.benchmark(save_baseline=True)
+        report['results']['cold']['posts:index']['queries'] = 0
+        with open(self.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file)
+        with self.assertRaisesMessage(CommandError, 'posts:index'):
+            self.benchmark()
@@ -0,0 +1,209 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from core.holes import fill_holes, punch
+from core.middleware import PIN_COOKIE
+from posts.cache import GLOBAL, page_key
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+def rendered(response):
+    return 'page_obj' in (response.context or [])
+
+
+class SingleFlightCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.index = reverse('posts:index')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        Post.objects.create(author=self.author, text='Старый пост')
+
+    def lock_index(self):
+        request = RequestFactory().get(self.index)
+        request.user = AnonymousUser()
+        request.punch_holes = True
+        cache.add(page_key(request, 'index', [GLOBAL]) + ':lock', 1)
+
+    def test_stale_page_served_while_other_worker_rebuilds(self):
+        self.client.get(self.index)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.lock_index()
+        response = self.client.get(self.index)
+        self.assertFalse(rendered(response))
+        self.assertNotContains(response, 'Новый пост')
+
+    def test_stale_page_keeps_its_validators(self):
+        etag = self.client.get(self.index)['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.lock_index()
+        response = self.client.get(self.index)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_file_cache_rebuilds_without_lock(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        backend = 'django.core.cache.backends.filebased.FileBasedCache'
+        with override_settings(CACHES={
+            'default': {'BACKEND': backend, 'LOCATION': directory}
+        }):
+            self.client.get(self.index)
+            Post.objects.create(author=self.author, text='Новый пост')
+            self.lock_index()
+            self.assertContains(self.client.get(self.index), 'Новый пост')
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_writer_does_not_get_previous_version(self):
+        self.client.get(self.index)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.lock_index()
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertContains(self.client.get(self.index), 'Новый пост')
+
+    @override_settings(DATABASES={
+        **settings.DATABASES, 'replica': settings.DATABASES['default']
+    })
+    def test_writer_bypasses_cached_page_with_replica(self):
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.client.get(self.index)
+        self.assertTrue(rendered(self.client.get(self.index)))
+
+    @override_settings(FEED_CACHE_TIMEOUT=0)
+    def test_expired_page_rebuilt_by_one_worker(self):
+        self.client.get(self.index)
+        self.lock_index()
+        self.assertFalse(rendered(self.client.get(self.index)))
+        cache.clear()
+        self.assertTrue(rendered(self.client.get(self.index)))
+        self.assertTrue(rendered(self.client.get(self.index)))
+
+
+class SharedPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.profile = reverse('posts:profile', args=[cls.author.username])
+        Post.objects.create(author=cls.author, text='Общий пост')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_logged_in_users_share_cached_page(self):
+        first = self.reader_client.get(reverse('posts:index'))
+        second = self.author_client.get(reverse('posts:index'))
+        anonymous = Client().get(reverse('posts:index'))
+        self.assertTrue(rendered(first))
+        self.assertFalse(rendered(second))
+        self.assertFalse(rendered(anonymous))
+        self.assertContains(first, 'Пользователь: reader')
+        self.assertContains(second, 'Пользователь: author')
+        self.assertContains(second, 'Избранные авторы')
+        self.assertContains(anonymous, 'Войти')
+        self.assertNotContains(anonymous, 'Избранные авторы')
+        self.assertNotContains(anonymous, '<!--hole:')
+
+    def test_follow_button_rendered_per_user(self):
+        response = self.author_client.get(self.profile)
+        self.assertNotContains(response, 'писаться')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        response = self.reader_client.get(self.profile)
+        self.assertContains(response, 'Отписаться')
+        response = Client().get(self.profile)
+        self.assertFalse(rendered(response))
+        self.assertContains(response, 'Подписаться')
+
+    def test_compressed_placeholder_is_filled(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        placeholder = punch(
+            'includes/follow_button.html',
+            {'author': 'a' * 100, 'author_id': 1},
+        )
+        self.assertIn('<!--hole:.', placeholder)
+        self.assertIn('Подписаться', fill_holes(request, placeholder))
+
+    def test_forged_placeholder_is_dropped(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        self.assertEqual(fill_holes(request, '<!--hole:forged:value-->'), '')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.id]),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('api:group_posts', args=[cls.group.slug]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_not_modified_without_rendering(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                repeated = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(repeated.status_code, 304)
+                self.assertIsNone(repeated.context)
+                repeated = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(repeated.status_code, 304)
+
+    def test_validators_change_with_content(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_validators_differ_between_users(self):
+        anonymous = self.client.get(self.urls[0])['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import comment_queue
+from posts.models import Comment, Post, User
+
+QUEUE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    COMMENTS_WRITE_BEHIND=True,
+    COMMENTS_FLUSH_ASYNC=False,
+    COMMENT_QUEUE_DIR=QUEUE_DIR,
+)
+class CommentQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.commenter = User.objects.create_user(username='commenter')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.url = reverse('posts:post_detail', args=[cls.post.id])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        self.commenter_client = Client()
+        self.commenter_client.force_login(self.commenter)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def comment(self, text, post_id=None):
+        return self.commenter_client.post(
+            reverse('posts:add_comment', args=[post_id or self.post.id]),
+            {'text': text},
+        )
+
+    def queued(self):
+        return os.listdir(os.path.join(QUEUE_DIR, comment_queue.NEW))
+
+    def test_comment_waits_in_queue_but_is_visible_to_commenter(self):
+        self.reader_client.get(self.url)
+        self.assertRedirects(self.comment('Из очереди'), self.url)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(len(self.queued()), 1)
+        self.assertContains(self.commenter_client.get(self.url), 'Из очереди')
+        self.assertNotContains(self.reader_client.get(self.url), 'Из очереди')
+
+    def test_flush_writes_batch_once(self):
+        for number in range(3):
+            self.comment(f'Комментарий {number}')
+        self.reader_client.get(self.url)
+        self.assertEqual(comment_queue.flush(), 3)
+        self.assertEqual(self.queued(), [])
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            [f'Комментарий {number}' for number in range(3)],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertContains(self.reader_client.get(self.url), 'Комментарий 2')
+        response = self.commenter_client.get(self.url)
+        self.assertEqual(len(response.context['comments']), 3)
+        self.assertEqual(
+            comment_queue.pending(self.commenter, self.post.id), []
+        )
+
+    def test_flush_keeps_submission_time(self):
+        self.comment('Время')
+        [waiting] = comment_queue.pending(self.commenter, self.post.id)
+        comment_queue.flush()
+        self.assertEqual(Comment.objects.get().created, waiting.created)
+
+    def test_replayed_file_is_written_once(self):
+        self.comment('Один раз')
+        name = comment_queue._claim(10)[0]
+        claimed = os.path.join(QUEUE_DIR, comment_queue.CLAIMED, name)
+        shutil.copy(claimed, claimed + '.copy')
+        comment_queue.flush()
+        # Процесс упал после записи в базу, но до удаления файла.
+        os.rename(
+            claimed + '.copy',
+            os.path.join(QUEUE_DIR, comment_queue.NEW, name),
+        )
+        self.assertEqual(comment_queue.flush(), 1)
+        self.assertEqual(Comment.objects.get().queue_name, name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_concurrent_comments_are_all_pending(self):
+        barrier = threading.Barrier(5)
+        backend = type(caches['default'])
+        read = backend.get
+
+        def slow_read(backend_cache, *args, **kwargs):
+            # Окно между чтением и записью кеша, в котором теряются
+            # комментарии соседних запросов.
+            value = read(backend_cache, *args, **kwargs)
+            time.sleep(0.2)
+            return value
+
+        def submit(number):
+            barrier.wait()
+            comment_queue.enqueue(
+                self.post.id, self.commenter, f'Поток {number}'
+            )
+
+        threads = [
+            threading.Thread(target=submit, args=(number,))
+            for number in range(5)
+        ]
+        with mock.patch.object(backend, 'get', slow_read):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(
+            sorted(
+                comment.text for comment in
+                comment_queue.pending(self.commenter, self.post.id)
+            ),
+            [f'Поток {number}' for number in range(5)],
+        )
+
+    def test_comment_to_missing_post(self):
+        self.assertEqual(self.comment('Мимо', post_id=1000).status_code, 404)
+        self.assertFalse(os.path.exists(QUEUE_DIR))
+
+    def test_comment_of_deleted_post_dropped(self):
+        post = Post.objects.create(author=self.author, text='Удалят')
+        self.comment('Потеряется', post_id=post.id)
+        post.delete()
+        self.assertEqual(comment_queue.flush(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    @override_settings(COMMENT_CLAIM_TIMEOUT=0)
+    def test_abandoned_claim_returns_to_queue(self):
+        self.comment('Забытый')
+        name = comment_queue._claim(10)[0]
+        past = time.time() - 10
+        os.utime(
+            os.path.join(QUEUE_DIR, comment_queue.CLAIMED, name),
+            (past, past),
+        )
+        call_command('flush_comments', stdout=StringIO())
+        self.assertEqual(Comment.objects.get().text, 'Забытый')
+
+    @override_settings(COMMENTS_WRITE_BEHIND=False)
+    def test_synchronous_mode(self):
+        self.comment('Сразу')
+        self.assertTrue(Comment.objects.filter(text='Сразу').exists())
+        self.assertFalse(os.path.exists(QUEUE_DIR))
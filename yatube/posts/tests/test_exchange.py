@@ -0,0 +1,178 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from posts.exchange import Importer, read_ndjson
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+from .test_thumbnails import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAILS_ASYNC=False)
+class ExchangeTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.pub_date = timezone.now() - datetime.timedelta(days=30)
+        self.post = Post.objects.create(
+            author=self.author,
+            group=self.group,
+            text='Старый пост',
+            image=SimpleUploadedFile('old.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.filter(pk=self.post.pk).update(pub_date=self.pub_date)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def wipe(self):
+        image = Post.objects.get(pk=self.post.pk).image.name
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, image))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def assert_restored(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Старый пост')
+        self.assertEqual(post.pub_date, self.pub_date)
+        self.assertEqual(post.author.get_full_name(), 'Лев Толстой')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertEqual(
+            AuthorStats.objects.get(user=post.author).followers_count, 1
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user__username='reader', post=post
+            ).exists()
+        )
+
+    def test_ndjson_round_trip_with_images(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        call_command(
+            'export_data', output=path, images=True, stderr=StringIO()
+        )
+        self.wipe()
+        call_command(
+            'import_data', path, batch_size=1,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+        self.assert_restored()
+        post = Post.objects.get(pk=self.post.pk)
+        with post.image.open() as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+        self.assertTrue(post.thumbnail_urls)
+
+    def test_csv_round_trip(self):
+        call_command(
+            'export_data', format='csv', output=self.directory,
+            stderr=StringIO(),
+        )
+        self.wipe()
+        paths = sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+        )
+        call_command(
+            'import_data', *paths, stdout=StringIO(), stderr=StringIO()
+        )
+        self.assert_restored()
+        new_post = Post.objects.create(
+            author=User.objects.get(username='author'), text='Новый пост'
+        )
+        self.assertGreater(new_post.pk, self.post.pk)
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_authors_are_not_fanned_out(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        call_command('export_data', output=path, stderr=StringIO())
+        self.wipe()
+        call_command(
+            'import_data', path, stdout=StringIO(), stderr=StringIO()
+        )
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_feeds_are_filled_once_after_import(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        call_command('export_data', output=path, stderr=StringIO())
+        self.wipe()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                'import_data', path, batch_size=1,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+        fills = [
+            query['sql'] for query in queries.captured_queries
+            if 'posts_feedentry (user_id, post_id, pub_date)' in query['sql']
+        ]
+        self.assertEqual(len(fills), 1)
+        self.assertEqual(FeedEntry.objects.count(), 1)
+
+    def test_import_into_filled_database_remaps_post_ids(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        call_command('export_data', output=path, stderr=StringIO())
+        call_command(
+            'import_data', path, stdout=StringIO(), stderr=StringIO()
+        )
+        copy = Post.objects.exclude(pk=self.post.pk).get()
+        self.assertEqual(copy.text, 'Старый пост')
+        self.assertEqual(copy.comments.get().text, 'Комментарий')
+        self.assertEqual(self.post.comments.count(), 1)
+
+    def test_import_into_empty_database_keeps_no_id_map(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        call_command('export_data', output=path, stderr=StringIO())
+        self.wipe()
+        importer = Importer()
+        with open(path, encoding='utf-8') as stream:
+            for model, row in read_ndjson(stream):
+                importer.add(model, row)
+        importer.finish()
+        self.assertEqual(importer.post_ids, {})
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments.get().text,
+            'Комментарий',
+        )
+
+    def test_invalid_date_is_reported_with_row(self):
+        path = os.path.join(self.directory, 'dump.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"model": "post", "id": 1, "author": "author", '
+                '"pub_date": "вчера", "text": "Пост"}\n'
+            )
+        with self.assertRaisesMessage(CommandError, 'post №1: Неверная дата'):
+            call_command(
+                'import_data', path, stdout=StringIO(), stderr=StringIO()
+            )
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def entries(self):
+        return FeedEntry.objects.filter(user=self.reader)
+
+    def test_follow_backfills_existing_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(self.entries().filter(post=self.old_post).exists())
+        self.assertEqual(self.feed_texts(), [self.old_post.text])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        entry = self.entries().get(post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(self.feed_texts(), [post.text, self.old_post.text])
+
+    def test_unfollow_prunes_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertFalse(self.entries().exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(self.entries().exists())
+        self.assertEqual(self.feed_texts(), [post.text, self.old_post.text])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_turning_popular_stays_in_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.feed_texts()
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed_texts(), [post.text, self.old_post.text])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_popular_authors_are_merged_page_by_page(self):
+        star = User.objects.create_user(username='star')
+        Follow.objects.create(user=self.reader, author=star)
+        Follow.objects.create(user=self.author, author=star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(12):
+            Post.objects.create(
+                author=star if number % 2 else self.author,
+                text=f'Пост {number}',
+            )
+        expected = list(
+            Post.objects.filter(author__in=[star, self.author])
+            .order_by('-pub_date', '-id').values_list('text', flat=True)
+        )
+        url = reverse('posts:follow_index')
+        pages = [self.reader_client.get(url).context['page_obj']]
+        while pages[-1].has_next():
+            pages.append(self.reader_client.get(
+                url + '?' + pages[-1].next_query
+            ).context['page_obj'])
+        self.assertEqual(
+            [post.text for page in pages for post in page], expected
+        )
+        back = self.reader_client.get(
+            url + '?' + pages[-1].previous_query
+        ).context['page_obj']
+        self.assertEqual(
+            [post.text for post in back], [post.text for post in pages[0]]
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_feed_honours_page_number(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        expected = list(
+            Post.objects.filter(author=self.author)
+            .values_list('text', flat=True)
+        )
+        url = reverse('posts:follow_index')
+        second = self.reader_client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(second.number, 2)
+        self.assertEqual(
+            [post.text for post in second], expected[10:]
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0, FEED_MERGE_AUTHORS=2)
+    def test_popular_authors_take_bounded_queries(self):
+        stars = [
+            User.objects.create_user(username=f'star{number}')
+            for number in range(5)
+        ]
+        for star in stars:
+            Follow.objects.create(user=self.reader, author=star)
+            Post.objects.create(author=star, text=star.username)
+        cache.clear()
+        url = reverse('posts:follow_index')
+        with CaptureQueriesContext(connection) as queries:
+            texts = [
+                post.text
+                for post in self.reader_client.get(url).context['page_obj']
+            ]
+        self.assertEqual(
+            texts, [star.username for star in reversed(stars)]
+        )
+        posts_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(posts_queries), 3)
@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}') for i in range(3)
+        ]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_sets_cached_after_first_load(self):
+        expected = {author.pk for author in self.authors[:2]}
+        self.assertEqual(follow_graph.following(self.reader.pk), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.following(self.reader.pk), expected
+            )
+            self.assertTrue(follow_graph.is_following(
+                self.reader.pk, self.authors[0].pk
+            ))
+            self.assertFalse(follow_graph.is_following(
+                self.reader.pk, self.authors[2].pk
+            ))
+        self.assertEqual(
+            follow_graph.followers(self.authors[0].pk), {self.reader.pk}
+        )
+        self.assertEqual(follow_graph.followers_count(self.authors[2].pk), 0)
+
+    def test_bulk_load_uses_one_query(self):
+        owners = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            followers = follow_graph.load(follow_graph.FOLLOWERS, owners)
+        self.assertEqual(followers[self.authors[1].pk], {self.reader.pk})
+        self.assertEqual(followers[self.authors[2].pk], set())
+
+    def test_change_applied_without_reload(self):
+        follow_graph.following(self.reader.pk)
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        self.assertIn(
+            self.authors[2].pk, follow_graph.following(self.reader.pk)
+        )
+        # Обработчик после фиксации дописывает подписку в перечитанное
+        # множество, и следующее чтение не идёт в базу.
+        follow_graph._patch(
+            follow_graph.FOLLOWING, self.reader.pk, self.authors[2].pk, True
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(len(follow_graph.following(self.reader.pk)), 3)
+
+    def test_stale_set_is_not_patched(self):
+        follow_graph.following(self.reader.pk)
+        follow_graph.forget([self.reader.pk])
+        follow_graph._patch(
+            follow_graph.FOLLOWING, self.reader.pk, self.authors[2].pk, True
+        )
+        with self.assertNumQueries(1):
+            self.assertNotIn(
+                self.authors[2].pk, follow_graph.following(self.reader.pk)
+            )
+
+    def test_counts_come_from_author_stats(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                follow_graph.followers_count(self.authors[0].pk), 1
+            )
+        self.assertEqual(follow_graph.following_count(self.reader.pk), 2)
+        self.assertEqual(follow_graph.followers_count(self.reader.pk), 0)
+
+    @override_settings(FOLLOW_GRAPH_MAX_SET=2)
+    def test_large_sets_are_not_cached(self):
+        follow_graph.following(self.reader.pk)
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        follow_graph._patch(
+            follow_graph.FOLLOWING, self.reader.pk, self.authors[2].pk, True
+        )
+        with self.assertNumQueries(1):
+            follow_graph.following(self.reader.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(follow_graph.following(self.reader.pk)), 3)
+
+    def test_follow_and_unfollow_views(self):
+        author = self.authors[2]
+        follow = reverse('posts:profile_follow', args=[author.username])
+        self.client.get(follow)
+        self.client.get(follow)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader, author=author).count(), 1
+        )
+        self.assertTrue(follow_graph.is_following(self.reader.pk, author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[author.username])
+        )
+        self.assertFalse(follow_graph.is_following(self.reader.pk, author.pk))
+        self.assertEqual(follow_graph.followers(author.pk), set())
+
+    def test_profile_does_not_query_follows(self):
+        url = reverse('posts:profile', args=[self.authors[0].username])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertFalse(
+            [query for query in queries if 'posts_follow' in query['sql']]
+        )
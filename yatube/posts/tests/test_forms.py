@@ -1,12 +1,16 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 from posts.forms import PostForm
 from posts.models import Group, Post
 
@@ -115,6 +119,77 @@ class PostFormTests(TestCase):
             ).exists()
         )
 
+    def test_edit_post_updates_only_form_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_author_client.post(
+                reverse('posts:post_edit', args=(1,)),
+                data={'text': 'Измененный текст'},
+            )
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"comments_count"', updates[0])
+        self.assertNotIn('"thumbnails"', updates[0])
+
+    def photo(self, size):
+        exif = Image.Exif()
+        exif[0x010f] = 'Тестовая камера'
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        return SimpleUploadedFile(
+            name='photo.jpg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_create_post_normalizes_large_photo(self):
+        self.authorized_author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.photo((400, 200))},
+        )
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_create_post_normalizes_large_animation(self):
+        buffer = BytesIO()
+        frames = [
+            Image.new('RGB', (300, 150), color) for color in ('red', 'blue')
+        ]
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:],
+            duration=50, loop=0,
+        )
+        self.authorized_author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Анимация', 'image': SimpleUploadedFile(
+                'animation.gif', buffer.getvalue(), 'image/gif'
+            )},
+        )
+        post = Post.objects.get(text='Анимация')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.n_frames, 2)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_create_post_rejects_huge_resolution(self):
+        tasks_count = Post.objects.count()
+        response = self.authorized_author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': self.photo((20, 20))},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большое разрешение картинки.'
+        )
+        self.assertEqual(Post.objects.count(), tasks_count)
+
     def test_cant_comment_guest_user(self):
         response = self.guest_client.post(
             reverse('posts:add_comment', args=(1,)),
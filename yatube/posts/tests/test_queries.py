@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POSTS_ON_PAGE = 10
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(POSTS_ON_PAGE)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.authors[0].username}
+            ),
+            reverse('posts:follow_index'),
+        )
+
+    def add_posts(self, amount):
+        for i in range(amount):
+            post = Post.objects.create(
+                author=self.authors[i % len(self.authors)],
+                text=f'Пост {i}',
+                group=self.group,
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {i}'
+            )
+        return post
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_list_pages_use_constant_number_of_queries(self):
+        self.add_posts(1)
+        few = {url: self.count_queries(url) for url in self.urls()}
+        self.add_posts(POSTS_ON_PAGE * 2)
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+    def test_post_detail_uses_constant_number_of_queries(self):
+        post = self.add_posts(1)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        few = self.count_queries(url)
+        for i in range(POSTS_ON_PAGE * 3):
+            Comment.objects.create(
+                post=post,
+                author=self.authors[i % len(self.authors)],
+                text=f'Ещё {i}',
+            )
+        self.add_posts(POSTS_ON_PAGE)
+        self.assertEqual(self.count_queries(url), few)
@@ -0,0 +1,103 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+LARGE_TABLES = ('posts_post', 'posts_comment', 'posts_follow',
+                'posts_feedentry')
+# SQLite до 3.36 пишет «SCAN TABLE posts_post», новые - «SCAN posts_post».
+FULL_SCAN = re.compile(
+    r'^SCAN (?:TABLE )?(?!TABLE )(\w+)\b'
+    r'(?! USING (COVERING )?INDEX)(?! VIRTUAL TABLE)'
+)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def urls(self):
+        after = '?after=' + encode_cursor((self.post.pub_date, self.post.id))
+        return (
+            reverse('posts:index'),
+            reverse('posts:index') + after,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+            + after,
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+            + '?after=' + encode_cursor((self.post.pub_date, 0)),
+            reverse('posts:follow_index'),
+        )
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def problems(self, sql):
+        if not any(f'"{table}"' in sql for table in LARGE_TABLES):
+            return []
+        found = []
+        for step in self.plan(sql):
+            scan = FULL_SCAN.match(step)
+            if scan and scan.group(1) in LARGE_TABLES:
+                found.append(step)
+            if 'USE TEMP B-TREE' in step:
+                found.append(step)
+        return found
+
+    def assert_indexed(self, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                for query in queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    self.assertEqual(
+                        self.problems(query['sql']), [], query['sql']
+                    )
+
+    def test_feed_queries_use_indexes(self):
+        self.assert_indexed(self.urls())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_authors_feed_uses_indexes(self):
+        url = reverse('posts:follow_index')
+        self.assert_indexed((
+            url,
+            url + '?after='
+            + encode_cursor((self.post.pub_date, self.post.id)),
+        ))
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from posts.models import Group, Post
+from posts.search import is_available, search_posts, stem
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов'
+        )
+        cls.cat_post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Наши коты любят ёлки и коробки',
+        )
+        cls.dog_post = Post.objects.create(
+            author=cls.other, text='Собака гуляет без кота'
+        )
+        cls.url = reverse('posts:search')
+
+    def found(self, **params):
+        response = self.client.get(self.url, params)
+        return [post.id for post in response.context['page_obj']]
+
+    def test_index_is_installed(self):
+        self.assertTrue(is_available())
+
+    def test_russian_word_forms_match(self):
+        self.assertEqual(stem('котами'), 'кот')
+        self.assertCountEqual(
+            self.found(q='котами'), [self.cat_post.id, self.dog_post.id]
+        )
+        self.assertEqual(self.found(q='ЕЛКА'), [self.cat_post.id])
+
+    def test_filters_by_group_and_author(self):
+        self.assertEqual(
+            self.found(q='кот', group=self.group.slug), [self.cat_post.id]
+        )
+        self.assertEqual(
+            self.found(q='кот', author=self.other.username),
+            [self.dog_post.id]
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        post = Post.objects.create(author=self.other, text='Собака спит')
+        post.text = 'Попугай'
+        post.save()
+        self.assertEqual(self.found(q='попугай'), [post.id])
+        self.assertEqual(self.found(q='спит'), [])
+        post.delete()
+        self.assertEqual(self.found(q='попугай'), [])
+
+    def test_ranked_keyset_pagination(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост про котов номер {i}')
+            for i in range(5)
+        )
+        first = search_posts('кот', per_page=3)
+        seen = [post.id for post in first]
+        page = first
+        while page.has_next():
+            page = search_posts('кот', after=page.next_cursor, per_page=3)
+            seen.extend(post.id for post in page)
+            if len(seen) == 6:
+                second = page
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        back = search_posts('кот', before=second.previous_cursor, per_page=3)
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in first]
+        )
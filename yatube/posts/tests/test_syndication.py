@@ -0,0 +1,128 @@
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Первый')
+        Post.objects.create(author=cls.other, text='Второй')
+
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def atom_titles(self, url):
+        response, content = self.fetch(url)
+        self.assertEqual(response.status_code, 200)
+        root = ElementTree.fromstring(content)
+        return [
+            entry.find(f'{ATOM}title').text
+            for entry in root.iter(f'{ATOM}entry')
+        ]
+
+    def test_atom_feeds(self):
+        for url, titles in (
+            (reverse('posts:feed', args=['atom']), ['Второй', 'Первый']),
+            (reverse('posts:group_feed', args=['group', 'atom']), ['Первый']),
+            (
+                reverse('posts:profile_feed', args=['other', 'atom']),
+                ['Второй'],
+            ),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.atom_titles(url), titles)
+
+    def test_rss_feed(self):
+        response, content = self.fetch(reverse('posts:feed', args=['rss']))
+        self.assertEqual(
+            response['Content-Type'], 'application/rss+xml; charset=utf-8'
+        )
+        channel = ElementTree.fromstring(content).find('channel')
+        self.assertEqual(len(channel.findall('item')), 2)
+
+    def test_missing_group(self):
+        response = self.client.get(
+            reverse('posts:group_feed', args=['missing', 'atom'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_streamed_then_cached(self):
+        url = reverse('posts:feed', args=['atom'])
+        first = self.client.get(url)
+        self.assertTrue(first.streaming)
+        content = b''.join(first.streaming_content)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertFalse(second.streaming)
+        self.assertEqual(second.content, content)
+        self.assertEqual(len(queries), 0)
+
+    def test_rows_are_read_inside_view(self):
+        url = reverse('posts:feed', args=['atom'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertTrue(
+            [query for query in queries if 'posts_post' in query['sql']]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 0)
+
+    def test_conditional_get(self):
+        url = reverse('posts:feed', args=['atom'])
+        etag = self.fetch(url)[0]['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        Post.objects.create(author=self.author, text='Третий')
+        response, content = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Третий', content.decode())
+
+    @override_settings(SYNDICATION_ITEMS=1)
+    def test_items_limit(self):
+        self.assertEqual(
+            self.atom_titles(reverse('posts:feed', args=['atom'])),
+            ['Второй'],
+        )
+
+    def test_replica_feed_etag_changes_with_time_bucket(self):
+        url = reverse('posts:feed', args=['atom'])
+        primary = self.fetch(url)[0]['ETag']
+        with mock.patch(
+            'posts.cache.reading_from_replica', return_value=True
+        ):
+            replica = self.fetch(url)[0]['ETag']
+            with override_settings(REPLICA_CACHE_TIMEOUT=10 ** 9):
+                later = self.fetch(url)[0]['ETag']
+        self.assertEqual(len({primary, replica, later}), 3)
+
+    def test_group_rename_refreshes_author_feed(self):
+        url = reverse('posts:profile_feed', args=['author', 'rss'])
+        self.assertIn('Группа'.encode(), self.fetch(url)[1])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertIn('Новое название'.encode(), self.fetch(url)[1])
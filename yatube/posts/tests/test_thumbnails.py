@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.images import variant_dir
+from posts.models import Post
+from posts.thumbnails import generate
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name=name, content=content, content_type='image/gif'
+            ),
+        )
+
+    def variant_files(self, post):
+        _, files = default_storage.listdir(variant_dir(post.image.name))
+        return files
+
+    def detail(self, post):
+        return self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+
+    @override_settings(THUMBNAILS_ASYNC=False)
+    def test_thumbnails_are_ready_after_save(self):
+        post = self.create_post()
+        post.refresh_from_db()
+        url = post.thumbnail_urls['card']
+        self.assertTrue(url.startswith(settings.MEDIA_URL + 'cache/'))
+        self.assertContains(self.detail(post), url)
+
+    @override_settings(THUMBNAILS_ASYNC=False)
+    def test_responsive_variants_are_rendered(self):
+        post = self.create_post()
+        post.refresh_from_db()
+        sources = post.image_sources
+        self.assertEqual(sources[-1]['type'], 'image/jpeg')
+        for source in sources:
+            with self.subTest(type=source['type']):
+                for width in settings.POST_IMAGE_WIDTHS:
+                    self.assertIn(f'/{width}.', source['srcset'])
+                    self.assertIn(f' {width}w', source['srcset'])
+        response = self.detail(post)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, sources[-1]['srcset'])
+
+    def test_placeholder_until_worker_finishes(self):
+        post = self.create_post()
+        self.assertEqual(post.thumbnail_urls, {})
+        self.assertContains(self.detail(post), 'Картинка обрабатывается')
+        generate(post.id)
+        post.refresh_from_db()
+        self.assertNotContains(self.detail(post), 'Картинка обрабатывается')
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            post.thumbnail_urls['card'],
+        )
+
+    @override_settings(THUMBNAILS_ASYNC=False)
+    def test_new_image_invalidates_thumbnails(self):
+        post = self.create_post()
+        post.refresh_from_db()
+        post.image = 'posts/other.gif'
+        self.assertEqual(post.thumbnail_urls, {})
+
+    @override_settings(THUMBNAILS_ASYNC=False)
+    def test_variants_do_not_collide_on_stem(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2, 2), 'blue').save(buffer, 'PNG')
+        gif = self.create_post('same.gif')
+        png = self.create_post('same.png', buffer.getvalue())
+        gif.refresh_from_db()
+        png.refresh_from_db()
+        self.assertNotEqual(
+            gif.image_sources[-1]['srcset'], png.image_sources[-1]['srcset']
+        )
+        self.assertTrue(self.variant_files(gif))
+        self.assertTrue(self.variant_files(png))
+
+    @override_settings(THUMBNAILS_ASYNC=False)
+    def test_old_variants_are_removed(self):
+        post = self.create_post()
+        post.refresh_from_db()
+        old = post.image.name
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        self.assertEqual(default_storage.listdir(variant_dir(old))[1], [])
+        post.refresh_from_db()
+        self.assertTrue(self.variant_files(post))
+        directory = variant_dir(post.image.name)
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ):
+            post.delete()
+        self.assertEqual(default_storage.listdir(directory)[1], [])
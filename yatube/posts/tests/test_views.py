@@ -6,15 +6,19 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template.loader import render_to_string
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post
+from posts.models import Comment, Follow, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 User = get_user_model()
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
 NUMBER_ONE = 1
 
 
@@ -120,6 +124,67 @@ class PostPagesTests(TestCase):
                 self.assertEqual(len(response.context['page_obj']), pages)
                 objs -= POSTS_ON_PAGE
 
+    def keyset_walk(self, url, objs, client=None):
+        client = client or self.client
+        seen = []
+        query = ''
+        while True:
+            response = client.get(url + query)
+            page_obj = response.context['page_obj']
+            self.assertTrue(page_obj.is_keyset)
+            self.assertLessEqual(len(page_obj), POSTS_ON_PAGE)
+            seen.extend(post.id for post in page_obj)
+            if not page_obj.has_next():
+                break
+            query = '?' + page_obj.next_query
+        self.assertEqual(len(seen), objs)
+        self.assertEqual(len(set(seen)), objs)
+        return page_obj
+
+    def test_keyset_pagination_walks_all_posts(self):
+        for url, objs in (
+            (self.index, 26), (self.group_list, 13), (self.profile1, 13)
+        ):
+            with self.subTest(url=url):
+                self.keyset_walk(url, objs)
+        self.keyset_walk(self.follow_index, 13, self.follower_client)
+
+    def test_keyset_pagination_previous_page(self):
+        first = self.client.get(self.index).context['page_obj']
+        second = self.client.get(
+            self.index + '?' + first.next_query
+        ).context['page_obj']
+        self.assertTrue(second.has_previous())
+        back = self.client.get(
+            self.index + '?' + second.previous_query
+        ).context['page_obj']
+        self.assertEqual(
+            [post.id for post in back], [post.id for post in first]
+        )
+        self.assertFalse(back.has_previous())
+
+    def test_keyset_pagination_skips_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.index + '?after=bogus')
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
+    def test_malformed_cursor_opens_first_page(self):
+        first = self.client.get(self.index).context['page_obj']
+        for query in (
+            'after=WyJ4IiwieSJd',
+            'after=W251bGwsbnVsbF0',
+            'before=W251bGwsbnVsbF0',
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(self.index + '?' + query)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    [post.id for post in first],
+                )
+
     def test_pages_uses_correct_template_for_author(self):
         for url in self.url_templates:
             reverse_name, template = url
@@ -149,6 +214,37 @@ class PostPagesTests(TestCase):
         post_number = response.context.get('post').id
         self.assertEqual(post_number, NUMBER_ONE)
 
+    def test_detail_page_comments_paginated(self):
+        Comment.objects.bulk_create(
+            Comment(post_id=NUMBER_ONE, author=self.author2, text=f'К {i}')
+            for i in range(COMMENTS_ON_PAGE + 5)
+        )
+        comments = self.client.get(self.post_detail).context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertTrue(comments.has_next())
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': NUMBER_ONE})
+            + '?' + comments.next_query
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(response, 'data-more')
+        seen = [comment.id for comment in [*comments, *rest]]
+        self.assertEqual(
+            seen,
+            list(Comment.objects.order_by('-created', '-id').values_list(
+                'id', flat=True
+            )),
+        )
+
+    def test_comments_fragment_of_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 1000})
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_post_create_page_show_correct_context(self):
         response = self.authorized_author_client.get(self.post_create)
         for value, expected in self.form_fields.items():
@@ -214,16 +310,70 @@ class PostPagesTests(TestCase):
         self.image_test(self.post_detail, 'post', False)
 
     def test_cache(self):
-        response1 = self.client.get(self.index).content
+        response1 = self.client.get(self.index)
+        response2 = self.client.get(self.index)
+        self.assertNotIn('page_obj', response2.context)
+        self.assertEqual(response1.content, response2.content)
         Post.objects.create(
             author=self.author2,
             text='Пост для кеша',
         )
-        response2 = self.client.get(self.index).content
-        self.assertEqual(response1, response2)
-        cache.clear()
-        response3 = self.client.get(self.index).content
-        self.assertNotEqual(response1, response3)
+        response3 = self.client.get(self.index)
+        self.assertNotEqual(response1.content, response3.content)
+        self.assertContains(response3, 'Пост для кеша')
+
+    def test_cache_invalidated_only_for_affected_feeds(self):
+        self.client.get(self.group_list)
+        self.client.get(self.profile2)
+        Post.objects.create(author=self.author2, text='Пост без группы')
+        self.assertNotIn('page_obj', self.client.get(self.group_list).context)
+        self.assertContains(self.client.get(self.profile2), 'Пост без группы')
+
+    def test_cache_invalidated_by_comment(self):
+        self.client.get(self.post_detail)
+        self.authorized_author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': NUMBER_ONE}),
+            {'text': 'Свежий комментарий'},
+        )
+        self.assertContains(
+            self.client.get(self.post_detail), 'Свежий комментарий'
+        )
+
+    def test_post_card_fragment_is_reused_until_post_changes(self):
+        post = Post.objects.create(author=self.author2, text='Карточка')
+        self.client.get(self.index)
+        Post.objects.filter(pk=post.pk).update(text='Без сохранения')
+        self.assertContains(self.client.get(self.profile2), 'Карточка')
+        post.refresh_from_db()
+        post.save()
+        self.assertContains(self.client.get(self.profile2), 'Без сохранения')
+
+    def test_post_card_fragment_follows_author_name(self):
+        post = Post.objects.create(author=self.author2, text='Карточка')
+
+        def card():
+            return render_to_string(
+                'includes/post_card.html',
+                {'post': Post.objects.for_feed().get(pk=post.pk)},
+            )
+
+        card()
+        User.objects.filter(pk=self.author2.pk).update(
+            first_name='Новое', last_name='Имя'
+        )
+        self.assertIn('Новое Имя', card())
+
+    def test_author_rename_refreshes_cached_pages(self):
+        Post.objects.create(author=self.author2, text='Свежий пост')
+        for url in (self.index, self.profile2):
+            self.client.get(url)
+        author = User.objects.get(pk=self.author2.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        for url in (self.index, self.profile2):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новое Имя')
 
     def post_for_follower(self):
         return self.follower_client.get(
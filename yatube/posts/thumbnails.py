@@ -0,0 +1,80 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from core import profiling
+
+from .cache import bump, scopes_for_post
+from .images import delete_variants, make_variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def build(post):
+    return {
+        name: get_thumbnail(post.image, geometry, **options).url
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items()
+    }
+
+
+def generate(post_id):
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return
+    previous = json.loads(post.thumbnails or '{}').get('source')
+    data = json.dumps({
+        'source': post.image.name,
+        'urls': build(post),
+        'sources': make_variants(post.image),
+    })
+    updated = Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        thumbnails=data, updated=timezone.now()
+    )
+    if updated:
+        bump(*scopes_for_post(post))
+        if previous and previous != post.image.name:
+            delete_variants(previous)
+
+
+def _run(post_id, profile=False):
+    try:
+        with profiling.profiled(
+            'thumbnails', profile or settings.PROFILER_ENABLED
+        ):
+            generate(post_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post_id):
+    if not settings.THUMBNAILS_ASYNC:
+        generate(post_id)
+        return
+    # Миниатюры профилируемого запроса готовятся в фоне, поэтому их профиль
+    # снимается отдельно.
+    profile = profiling.active()
+    transaction.on_commit(
+        lambda: get_executor().submit(_run, post_id, profile)
+    )
@@ -1,10 +1,207 @@
+import base64
+import binascii
+import heapq
+import json
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
 
 AMOUNT_POSTS: int = 10
+AMOUNT_COMMENTS: int = 20
+POST_KEYS: tuple = ('pub_date', 'id')
+COMMENT_KEYS: tuple = ('created', 'id')
+
+
+def encode_cursor(values):
+    raw = json.dumps(
+        [value.isoformat() if hasattr(value, 'isoformat') else value
+         for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, keys):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        values = [
+            model._meta.get_field(key).to_python(value)
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None
+    # По None нельзя искать: такой курсор тоже считается испорченным.
+    if any(value is None for value in values):
+        return None
+    return values
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_query = ''
+        self.previous_query = ''
+        self.first_query = ''
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+
+class KeysetPaginator:
+    """Пагинация по курсору: без COUNT(*) и OFFSET, ключи по убыванию."""
 
+    def __init__(self, queryset, per_page, keys=POST_KEYS):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = keys
 
-def get_page(request, posts):
-    paginator = Paginator(posts, AMOUNT_POSTS)
+    @staticmethod
+    def _seek(queryset, keys, values, lookup):
+        condition = Q()
+        for position, key in enumerate(keys):
+            step = Q(**{f'{key}__{lookup}': values[position]})
+            for previous, value in zip(keys[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return queryset.filter(condition)
+
+    @staticmethod
+    def _values(obj, keys):
+        # Строки из values() - словари, а не экземпляры моделей.
+        if isinstance(obj, dict):
+            return tuple(obj[key] for key in keys)
+        return tuple(getattr(obj, key) for key in keys)
+
+    def _read(self, queryset, keys, values, lookup, descending):
+        """Строки после курсора с их ключами, не больше per_page + 1."""
+        if values:
+            queryset = self._seek(queryset, keys, values, lookup)
+        order = [f'-{key}' if descending else key for key in keys]
+        return [
+            (self._values(obj, keys), obj)
+            for obj in queryset.order_by(*order)[:self.per_page + 1]
+        ]
+
+    def _fetch(self, values, lookup, descending):
+        return self._read(
+            self.queryset, self.keys, values, lookup, descending
+        )
+
+    def get_page(self, after=None, before=None):
+        model = self.queryset.model
+        after_values = after and decode_cursor(after, model, self.keys)
+        before_values = before and decode_cursor(before, model, self.keys)
+        if before_values:
+            rows = self._fetch(before_values, 'gt', descending=False)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            rows = self._fetch(after_values, 'lt', descending=True)
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after_values)
+        if not rows:
+            return KeysetPage([], False, False)
+        return KeysetPage(
+            [obj for _, obj in rows],
+            has_next,
+            has_previous,
+            next_cursor=encode_cursor(rows[-1][0]) if has_next else None,
+            previous_cursor=(
+                encode_cursor(rows[0][0]) if has_previous else None
+            ),
+        )
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Пагинация по курсору сразу по нескольким выборкам.
+
+    sources - пары (queryset, keys), ключи у всех одного смысла и порядка.
+    Третьим элементом можно передать функцию, которая приводит строки
+    выборки к общему виду. Каждая выборка читается по своему индексу не
+    больше чем на страницу вперёд, страницы сливаются по ключам, повторы
+    по ключам отбрасываются.
+    """
+
+    def __init__(self, sources, per_page):
+        queryset, keys = sources[0][:2]
+        super().__init__(queryset, per_page, keys)
+        self.sources = sources
+
+    def _fetch(self, values, lookup, descending):
+        runs = []
+        for queryset, keys, *convert in self.sources:
+            rows = self._read(queryset, keys, values, lookup, descending)
+            if convert:
+                rows = [(key, convert[0](obj)) for key, obj in rows]
+            runs.append(rows)
+        rows, seen = [], set()
+        for key, obj in heapq.merge(
+            *runs, key=itemgetter(0), reverse=descending
+        ):
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append((key, obj))
+            if len(rows) > self.per_page:
+                break
+        return rows
+
+
+def query_with(request, **params):
+    query = request.GET.copy()
+    for name in ('page', 'after', 'before'):
+        query.pop(name, None)
+    for name, value in params.items():
+        if value:
+            query[name] = value
+    return query.urlencode()
+
+
+def get_page(request, posts, per_page=AMOUNT_POSTS, keys=POST_KEYS):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = Paginator(posts, per_page)
+        return paginator.get_page(page_number)
+    page_obj = KeysetPaginator(posts, per_page, keys).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return link_pages(request, page_obj)
+
+
+def link_pages(request, page_obj):
+    page_obj.first_query = query_with(request)
+    page_obj.next_query = query_with(request, after=page_obj.next_cursor)
+    page_obj.previous_query = query_with(
+        request, before=page_obj.previous_cursor
+    )
     return page_obj
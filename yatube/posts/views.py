@@ -1,15 +1,54 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
 
-from .forms import CommentForm, PostForm, GroupForm
-from .models import Follow, Group, Post, User
-from .utils import get_page
+from . import comment_queue, follow_graph, syndication
+from .cache import GLOBAL, cached_view
+from .feed import get_follow_page
+from .forms import CommentForm, PostForm, GroupForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .search import get_search_page
+from .utils import AMOUNT_COMMENTS, COMMENT_KEYS, get_page
 
 
-@cache_page(20, key_prefix='index_page')
+def comment_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return get_page(request, comments, AMOUNT_COMMENTS, COMMENT_KEYS)
+
+
+def with_pending(user, post_id, comments):
+    saved = {(comment.author_id, comment.created) for comment in comments}
+    waiting = [
+        comment for comment in comment_queue.pending(user, post_id)
+        if (comment.author_id, comment.created) not in saved
+    ]
+    return waiting[::-1] + list(comments)
+
+
+def post_scopes(request, post_id):
+    # Пока комментарии пользователя ждут в очереди, он видит страницу
+    # поста без кеша и со своими комментариями.
+    if comment_queue.pending(request.user, post_id):
+        return None
+    related = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if related is None:
+        return None
+    username, slug = related
+    scopes = [('post', post_id), ('author', username)]
+    if slug:
+        scopes.append(('group', slug))
+    return scopes
+
+
+@cached_view(lambda request: [GLOBAL], shared=True)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     page_obj = get_page(request, posts)
     context = {
         'page_obj': page_obj,
@@ -18,9 +57,10 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@cached_view(lambda request, slug: [('group', slug)], shared=True)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     page_obj = get_page(request, posts)
     context = {
         'group': group,
@@ -29,34 +69,92 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cached_view(
+    lambda request, username: [('author', username)], shared=True
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (
-        request.user.is_authenticated
-        and request.user.follower.filter(author=author).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
     )
-    posts = author.posts.all()
+    posts = author.posts.for_feed()
     page_obj = get_page(request, posts)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cached_view(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'), pk=post_id
+    )
     comment_form = CommentForm()
-    comments = post.comments.all()
+    comments = comment_page(request, post_id)
+    if not comments.has_previous():
+        comments.object_list = with_pending(
+            request.user, post_id, comments.object_list
+        )
     context = {
         'post': post,
         'form': comment_form,
-        'comments': comments
+        'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cached_view(lambda request, post_id: [('post', post_id)])
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page(request, post_id),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def feed(request, kind):
+    return syndication.respond(
+        request, kind, [GLOBAL], Post.objects.all(),
+        title='Yatube: последние записи',
+        link=reverse('posts:index'),
+        description='Последние записи всех авторов.',
+    )
+
+
+def group_feed(request, kind, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return syndication.respond(
+        request, kind, [('group', slug)], group.posts.all(),
+        title=f'Yatube: {group.title}',
+        link=reverse('posts:group_list', args=[slug]),
+        description=group.description,
+    )
+
+
+def profile_feed(request, kind, username):
+    author = get_object_or_404(User, username=username)
+    return syndication.respond(
+        request, kind, [('author', username)], author.posts.all(),
+        title=f'Yatube: {author.get_full_name() or username}',
+        link=reverse('posts:profile', args=[username]),
+        description=f'Записи пользователя {username}.',
+    )
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        page_obj = get_search_page(request, **form.cleaned_data)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -78,7 +176,10 @@ def post_edit(request, post_id):
             instance=post
         )
         if form.is_valid():
-            form.save()
+            # Счётчики и миниатюры меняются в базе отдельно: сохраняем
+            # только поля формы, чтобы не затереть их старыми значениями.
+            post = form.save(commit=False)
+            post.save(update_fields=[*PostForm.Meta.fields, 'updated'])
             return redirect('posts:post_detail', post_id)
         context = {
             'form': form,
@@ -91,7 +192,13 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.COMMENTS_WRITE_BEHIND:
+        if not Post.objects.filter(pk=post_id).exists():
+            raise Http404
+        comment_queue.enqueue(
+            post_id, request.user, form.cleaned_data['text']
+        )
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = Post.objects.get(pk=post_id)
@@ -100,9 +207,9 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cached_view(lambda request: [GLOBAL, ('follow', request.user.pk)])
 def follow_index(request):
-    post = Post.objects.filter(author__following__user=request.user.id)
-    page_obj = get_page(request, post)
+    page_obj = get_follow_page(request)
     context = {
         'page_obj': page_obj,
         'follow': True
@@ -113,11 +220,12 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    existing_sub = Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
-    if request.user != author and not existing_sub:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author and not follow_graph.is_following(
+        request.user.pk, author.pk
+    ):
+        # get_or_create переживает гонку двух одинаковых подписок:
+        # вторая упирается в unique_follows и читает первую.
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
 
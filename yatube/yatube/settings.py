@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +40,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -52,7 +56,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,12 +74,82 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# По умолчанию SQLite, для продакшена профиль PostgreSQL задаётся через
+# переменные окружения YATUBE_DB_*. Пул соединений держит PgBouncer:
+# YATUBE_DB_PGBOUNCER=1 отключает серверные курсоры, несовместимые
+# с пулом в режиме транзакций.
+DB_ENGINE = os.environ.get('YATUBE_DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+            'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+            'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+            'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+            'DISABLE_SERVER_SIDE_CURSORS': bool(
+                os.environ.get('YATUBE_DB_PGBOUNCER')
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get(
+                'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+        }
     }
+
+# Реплика для чтения: YATUBE_DB_REPLICA_HOST для PostgreSQL или
+# YATUBE_DB_REPLICA_NAME (путь ко второму файлу) для проверки на SQLite.
+if os.environ.get('YATUBE_DB_REPLICA_HOST') or os.environ.get(
+    'YATUBE_DB_REPLICA_NAME'
+):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get(
+            'YATUBE_DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')
+        ),
+        'NAME': os.environ.get(
+            'YATUBE_DB_REPLICA_NAME', DATABASES['default']['NAME']
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Настройки каждого нового соединения с SQLite: WAL не блокирует чтение
+# во время записи, а busy_timeout (мс) заставляет писателя подождать
+# освобождения блокировки вместо ошибки «database is locked».
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
+# Транзакции atomic() сразу берут блокировку записи, см. core/signals.py.
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+
+# Эти страницы читают с реплики, пока пользователь недавно ничего не писал.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:feed',
+    'posts:group_feed',
+    'posts:profile_feed',
+)
+REPLICA_PIN_SECONDS = 10
+REPLICA_CACHE_TIMEOUT = 10
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,8 +190,114 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кеш общий для всех процессов: YATUBE_CACHE=file хранит его в каталоге
+# YATUBE_CACHE_LOCATION, YATUBE_CACHE=redis - в Redis по адресу
+# YATUBE_CACHE_LOCATION (нужен пакет django-redis). По умолчанию и в тестах
+# используется локальный кеш процесса.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'redis': ('django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+
+# Пересобирает страницу один процесс: он держит блокировку не дольше
+# CACHE_LOCK_TIMEOUT секунд, остальные отдают устаревшую копию, которая
+# хранится ещё CACHE_STALE_TIMEOUT секунд после истечения. Если копии нет,
+# запрос ждёт готовую страницу до CACHE_LOCK_WAIT секунд. Блокировка
+# работает только с бэкендами, где cache.add атомарен (locmem, memcached,
+# redis), с файловым кешем страницы пересобираются без неё.
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+CACHE_STALE_TIMEOUT = 5 * 60
+
+# Авторы с большим числом подписчиков не раскладывают посты по лентам
+# при публикации: их посты подмешиваются в ленту при чтении. Список таких
+# авторов живёт в кеше POPULAR_AUTHORS_TIMEOUT секунд. Посты первых
+# FEED_MERGE_AUTHORS из них читаются отдельным запросом на автора,
+# остальных - одним общим запросом.
+FEED_FANOUT_LIMIT = 10000
+POPULAR_AUTHORS_TIMEOUT = 60
+FEED_MERGE_AUTHORS = 20
+
+# Множества подписок и подписчиков каждого пользователя в кеше. Множества
+# больше FOLLOW_GRAPH_MAX_SET читаются из базы: одно значение кеша не
+# должно расти вместе с числом подписчиков.
+FOLLOW_GRAPH_TIMEOUT = 24 * 60 * 60
+FOLLOW_GRAPH_MAX_SET = 10000
+
+# Страницы лент живут в кеше, пока их не сбросит запись в базу.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Число записей в лентах Atom и RSS.
+SYNDICATION_ITEMS = 50
+
+# Миниатюры картинок постов готовятся в фоне после сохранения поста.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAILS_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# С COMMENTS_WRITE_BEHIND комментарии сначала пишутся в очередь на диске,
+# а в базу попадают пачками по COMMENT_BATCH_SIZE в фоне через
+# COMMENT_FLUSH_DELAY секунд. Без COMMENTS_FLUSH_ASYNC очередь разбирает
+# только manage.py flush_comments. Забранные упавшим процессом комментарии
+# возвращаются в очередь через COMMENT_CLAIM_TIMEOUT секунд.
+COMMENTS_WRITE_BEHIND = False
+COMMENTS_FLUSH_ASYNC = True
+COMMENT_QUEUE_DIR = os.path.join(BASE_DIR, 'comment_queue')
+COMMENT_FLUSH_DELAY = 0.5
+COMMENT_BATCH_SIZE = 500
+COMMENT_CLAIM_TIMEOUT = 60
+
+# Варианты картинок для <picture>/srcset: форматы в порядке предпочтения,
+# неподдерживаемые сборкой Pillow пропускаются, JPEG добавляется всегда.
+POST_IMAGE_FORMATS = ('avif', 'webp')
+POST_IMAGE_WIDTHS = (480, 960)
+
+# Загрузки крупнее этого порога пишутся во временный файл, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
+# Ограничения на загружаемые картинки постов: более крупные по стороне
+# уменьшаются, а метаданные EXIF вырезаются при сохранении.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Метрики процесса в формате Prometheus отдаются по /metrics только этим
+# адресам. За обратным прокси это адрес прокси.
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# У доли запросов SLOW_REQUEST_SAMPLE_RATE запоминаются первые
+# SLOW_REQUEST_MAX_QUERIES запросов к базе; если такой запрос шёл дольше
+# SLOW_REQUEST_SECONDS, он пишется в лог core.middleware вместе с SQL.
+SLOW_REQUEST_SECONDS = 1.0
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+SLOW_REQUEST_MAX_QUERIES = 50
+
+# Профили запросов пишутся в PROFILER_DIR: всех запросов с PROFILER_ENABLED
+# или тех, где заголовок X-Profile совпадает с PROFILER_TOKEN. Пустой
+# PROFILER_VIEWS - любые представления. Режимы: cprofile (файлы .pstats)
+# и sampling (свёрнутые стеки для флеймграфа). Не больше
+# PROFILER_RATE_LIMIT профилей в минуту на процесс.
+PROFILER_ENABLED = False
+PROFILER_TOKEN = os.environ.get('YATUBE_PROFILER_TOKEN', '')
+PROFILER_VIEWS = []
+PROFILER_MODE = os.environ.get('YATUBE_PROFILER_MODE', 'cprofile')
+PROFILER_SAMPLE_INTERVAL = 0.005
+PROFILER_RATE_LIMIT = 6
+PROFILER_DIR = os.path.join(BASE_DIR, 'profiles')